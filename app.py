@@ -21,6 +21,7 @@ import config
 from src.ingestion.ingest import ingest_documents, ingest_pdfs
 from src.tutoring.tutor import CISSPTutor
 from src.exam.exam_generator import ExamGenerator, Exam, ExamAttempt
+from src.retrieval.warmup import WarmupManager
 
 
 # Initialize the components
@@ -29,6 +30,12 @@ def initialize_components():
     """Initialize all system components."""
     tutor = CISSPTutor()
     exam_generator = ExamGenerator()
+
+    # Load the LLM and embedding model now and keep them warm, so users never hit a cold start
+    warmup = WarmupManager(tutor.llm, tutor.retriever)
+    print(WarmupManager.format_report(warmup.warm_up()))
+    warmup.start_keep_warm()
+
     spaced_system = SpacedRepetitionSystem()
     flashcards = FlashcardSystem()
     progress = ProgressTracker()
@@ -263,10 +270,75 @@ def main():
 
 
 
+def render_search_filters(tutor, key_prefix):
+    """Render search scope controls and return the selected filters."""
+    options = tutor.retriever.get_filter_options()
+
+    with st.expander("Search scope"):
+        titles = st.multiselect("Books", options["titles"], key=f"{key_prefix}_titles")
+        source_type = st.selectbox("Document type", ["Any"] + options["source_types"],
+                                   key=f"{key_prefix}_source_type")
+        domain = st.selectbox("CISSP domain", ["Any"] + options["domains"], key=f"{key_prefix}_domain")
+        col1, col2 = st.columns(2)
+        with col1:
+            first_page = st.number_input("From page", min_value=0, value=0, step=1, key=f"{key_prefix}_first_page")
+        with col2:
+            last_page = st.number_input("To page (0 = last)", min_value=0, value=0, step=1,
+                                        key=f"{key_prefix}_last_page")
+
+    page_range = None
+    if first_page or last_page:
+        page_range = (first_page or None, last_page or None)
+
+    return {
+        "title": titles,
+        "source_type": None if source_type == "Any" else source_type,
+        "domain": None if domain == "Any" else domain,
+        "page_range": page_range
+    }
+
+
+def wait_for_follow_ups(follow_ups):
+    """Get an answer's follow-up questions, showing a spinner while they are still being generated."""
+    if not follow_ups.done():
+        with st.spinner("Suggesting follow-up questions..."):
+            return follow_ups.result()
+    return follow_ups.result()
+
+
+def stream_answer(tutor, question, filters=None):
+    """
+    Answer a question, rendering the answer as it is generated.
+
+    Args:
+        tutor: CISSPTutor instance
+        question: User question
+        filters: Optional search scope
+
+    Returns:
+        The tutor's response, complete once the answer has been rendered
+    """
+    with st.spinner("Thinking..."):
+        response = tutor.answer_question_stream(st.session_state.user_id, question, filters=filters)
+
+    placeholder = st.empty()
+    answer = ""
+    for token in response["answer_stream"]:
+        answer += token
+        placeholder.markdown(answer + "▌")
+    placeholder.markdown(answer)
+    return response
+
+
 def render_tutor_mode(tutor):
     """Render the tutor mode interface."""
     st.header("CISSP Tutor")
 
+    filters = render_search_filters(tutor, "tutor")
+    reuse_answers = st.checkbox("Reuse answers to near-identical questions", value=True, key="reuse_answers",
+                                help="Turn off to always generate a fresh answer")
+    tutor.set_answer_cache_opt_out(st.session_state.user_id, not reuse_answers)
+
     # Create tabs for different learning modes
     tab1, tab2, tab3 = st.tabs(["Practice Questions", "Chat Assistant", "Study Materials"])
 
@@ -288,9 +360,9 @@ def render_tutor_mode(tutor):
                 st.write(message["content"])
 
                 # Display follow-up questions if available
-                if "follow_up_questions" in message:
+                if message.get("follow_ups") is not None:
                     st.markdown("**Follow-up Questions:**")
-                    for i, question in enumerate(message["follow_up_questions"]):
+                    for i, question in enumerate(wait_for_follow_ups(message["follow_ups"])):
                         if st.button(f"{question}", key=f"followup_{i}_{hash(question)}"):
                             # When a follow-up question is clicked, add it as a user message
                             st.session_state.chat_history.append({
@@ -298,14 +370,12 @@ def render_tutor_mode(tutor):
                                 "content": question
                             })
                             # Process the follow-up question
-                            with st.spinner("Thinking..."):
-                                response = tutor.answer_question(st.session_state.user_id, question)
-
-                                st.session_state.chat_history.append({
-                                    "role": "assistant",
-                                    "content": response["answer"],
-                                    "follow_up_questions": response["follow_up_questions"]
-                                })
+                            response = stream_answer(tutor, question, filters)
+                            st.session_state.chat_history.append({
+                                "role": "assistant",
+                                "content": response["answer"],
+                                "follow_ups": response["follow_ups"]
+                            })
                             st.rerun()
 
     # Input for new questions
@@ -321,48 +391,46 @@ def render_tutor_mode(tutor):
 
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = tutor.answer_question(st.session_state.user_id, prompt)
-
-                st.write(response["answer"])
-
-                # Display contradiction explanation if any
-                if response["has_contradictions"] and response["contradiction_explanation"]:
-                    st.warning("**Note:** I found contradictions in the source materials.")
-                    with st.expander("View contradiction analysis"):
-                        st.write(response["contradiction_explanation"])
-
-                # Display follow-up questions
-                if response["follow_up_questions"]:
-                    st.markdown("**Follow-up Questions:**")
-                    for i, question in enumerate(response["follow_up_questions"]):
-                        if st.button(f"{question}", key=f"followup_{i}_{hash(question)}"):
-                            # When a follow-up question is clicked, add it as a user message
-                            st.session_state.chat_history.append({
-                                "role": "user",
-                                "content": question
-                            })
-                            # Process the follow-up question
-                            with st.spinner("Thinking..."):
-                                follow_up_response = tutor.answer_question(st.session_state.user_id, question)
-
-                                st.session_state.chat_history.append({
-                                    "role": "assistant",
-                                    "content": follow_up_response["answer"],
-                                    "follow_up_questions": follow_up_response["follow_up_questions"]
-                                })
-                            st.rerun()
+            # The remaining response fields are filled in once the stream is exhausted
+            response = stream_answer(tutor, prompt, filters)
+
+            # Display contradiction explanation if any
+            if response["has_contradictions"] and response["contradiction_explanation"]:
+                st.warning("**Note:** I found contradictions in the source materials.")
+                with st.expander("View contradiction analysis"):
+                    st.write(response["contradiction_explanation"])
+
+            # Display follow-up questions once they are generated
+            follow_up_questions = wait_for_follow_ups(response["follow_ups"])
+            if follow_up_questions:
+                st.markdown("**Follow-up Questions:**")
+                for i, question in enumerate(follow_up_questions):
+                    if st.button(f"{question}", key=f"followup_{i}_{hash(question)}"):
+                        # When a follow-up question is clicked, add it as a user message
+                        st.session_state.chat_history.append({
+                            "role": "user",
+                            "content": question
+                        })
+                        # Process the follow-up question
+                        follow_up_response = stream_answer(tutor, question, filters)
+                        st.session_state.chat_history.append({
+                            "role": "assistant",
+                            "content": follow_up_response["answer"],
+                            "follow_ups": follow_up_response["follow_ups"]
+                        })
+                        st.rerun()
 
-                # Add assistant message to chat history
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": response["answer"],
-                    "follow_up_questions": response["follow_up_questions"]
-                })
+            # Add assistant message to chat history
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": response["answer"],
+                "follow_ups": response["follow_ups"]
+            })
 
     # Clear chat button
     if st.session_state.chat_history and st.button("Clear Chat", key="clear_chat"):
         st.session_state.chat_history = []
+        tutor.reset_chat(st.session_state.user_id)
         st.rerun()
 
     # Add CSS for styling
@@ -1798,6 +1866,8 @@ def render_chat_interface(tutor):
     """Render the chat interface for asking questions about CISSP topics."""
     st.subheader("Chat with CISSP Assistant")
 
+    filters = render_search_filters(tutor, "chat")
+
     # Display chat history
     for message in st.session_state.chat_history:
         if message["role"] == "user":
@@ -1816,19 +1886,18 @@ def render_chat_interface(tutor):
 
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = tutor.answer_question(st.session_state.user_id, prompt)
-                st.write(response["answer"])
+            response = stream_answer(tutor, prompt, filters)
 
-                # Add assistant message to chat history
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": response["answer"]
-                })
+            # Add assistant message to chat history
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": response["answer"]
+            })
 
     # Clear chat button
     if st.session_state.chat_history and st.button("Clear Chat", key="clear_chat"):
         st.session_state.chat_history = []
+        tutor.reset_chat(st.session_state.user_id)
         st.rerun()
 
 def render_study_materials(tutor):
@@ -7,6 +7,7 @@ import sys
 import argparse
 import uuid
 import json
+import time
 from datetime import datetime
 
 # Add the project root to the path
@@ -17,6 +18,7 @@ import config
 from src.ingestion.ingest import ingest_documents, ingest_pdfs
 from src.tutoring.tutor import CISSPTutor
 from src.exam.exam_generator import ExamGenerator, Exam, ExamAttempt
+from src.retrieval.llm_interface import get_runtime
 
 
 def setup_argparse():
@@ -37,6 +39,14 @@ def setup_argparse():
     ask_parser = subparsers.add_parser("ask", help="Ask a question")
     ask_parser.add_argument("question", type=str, help="Question to ask")
     ask_parser.add_argument("--user_id", type=str, default=None, help="User ID")
+    ask_parser.add_argument("--book", type=str, nargs="+", default=None, help="Only search these book titles")
+    ask_parser.add_argument("--source_type", type=str, choices=["pdf", "epub"], default=None,
+                            help="Only search this document type")
+    ask_parser.add_argument("--pages", type=str, default=None,
+                            help="Only search this page range, e.g. 100-250, 100- or -250")
+    ask_parser.add_argument("--domain", type=str, default=None, help="Only search this CISSP domain")
+    ask_parser.add_argument("--no_cache", action="store_true", help="Always generate a fresh answer")
+    ask_parser.add_argument("--timings", action="store_true", help="Show LLM latency per task and model")
     
     # Generate exam command
     exam_parser = subparsers.add_parser("exam", help="Generate an exam")
@@ -50,6 +60,31 @@ def setup_argparse():
     take_parser.add_argument("exam_file", type=str, help="Path to the exam file")
     take_parser.add_argument("--user_id", type=str, default=None, help="User ID")
     
+    # Benchmark command
+    bench_parser = subparsers.add_parser("bench", help="Run performance benchmarks")
+    bench_parser.add_argument("target", type=str, choices=["retrieval", "compression"],
+                              help="Component to benchmark")
+    bench_parser.add_argument("--sample", type=int, default=100, help="Number of sample queries")
+    bench_parser.add_argument("--k", type=int, default=config.TOP_K, help="Neighbours for recall@k")
+    bench_parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32], help="HNSW M values to try")
+    bench_parser.add_argument("--ef_construction", type=int, nargs="+", default=[100, 200],
+                              help="HNSW ef_construction values to try")
+    bench_parser.add_argument("--ef_search", type=int, nargs="+", default=[10, 50, 100, 200],
+                              help="HNSW ef_search values to try")
+    bench_parser.add_argument("--ratio", type=float, default=None,
+                              help="Context compression ratio to evaluate (compression only)")
+    bench_parser.add_argument("--answers", action="store_true",
+                              help="Also compare LLM answers from full and compressed context (compression only)")
+    
+    # Warm-up command
+    warmup_parser = subparsers.add_parser("warmup", help="Preload the LLM and embedding model")
+    warmup_parser.add_argument("--keep_warm", action="store_true",
+                               help="Keep running and re-warm the models during working hours")
+    
+    # LLM response cache command
+    cache_parser = subparsers.add_parser("cache", help="Inspect or clear the LLM response cache")
+    cache_parser.add_argument("action", type=str, choices=["stats", "clear"], help="Cache action")
+    
     return parser
 
 
@@ -70,28 +105,55 @@ def handle_ingest(args):
     print("Ingestion complete")
 
 
+def parse_page_range(value):
+    """Parse a page range such as '100-250', '100-' or '-250'."""
+    if not value:
+        return None
+    first, _, last = value.partition("-")
+    return (int(first) if first.strip() else None, int(last) if last.strip() else None)
+
+
 def handle_ask(args):
     """Handle the ask command."""
     question = args.question
     user_id = args.user_id or str(uuid.uuid4())
+    filters = {
+        "title": args.book,
+        "source_type": args.source_type,
+        "page_range": parse_page_range(args.pages),
+        "domain": args.domain
+    }
     
     print(f"Question: {question}")
+    scope = ", ".join(f"{key}={value}" for key, value in filters.items() if value)
+    if scope:
+        print(f"Scope: {scope}")
     print("Thinking...")
     
     tutor = CISSPTutor()
-    response = tutor.answer_question(user_id, question)
+    if args.no_cache:
+        tutor.set_answer_cache_opt_out(user_id, True)
+    response = tutor.answer_question_stream(user_id, question, filters=filters)
     
     print("\nAnswer:")
-    print(response["answer"])
+    for token in response["answer_stream"]:
+        print(token, end="", flush=True)
+    print()
     
     if response["has_contradictions"]:
         print("\nContradictions detected:")
         print(response["contradiction_explanation"])
     
-    if response["follow_up_questions"]:
+    # Follow-up questions are generated after the answer; show them once ready
+    follow_ups = response["follow_ups"].result()
+    if follow_ups:
         print("\nFollow-up questions:")
-        for i, q in enumerate(response["follow_up_questions"]):
+        for i, q in enumerate(follow_ups):
             print(f"{i+1}. {q}")
+    
+    if args.timings:
+        print("\nLLM timings:")
+        print(tutor.llm.router.format_stats(tutor.llm.router.get_stats()))
 
 
 def handle_exam_generation(args):
@@ -121,6 +183,15 @@ def handle_exam_generation(args):
         filepath = exam.save_to_file()
     
     print(f"Exam saved to: {filepath}")
+    
+    if generator.llm.cache is not None:
+        stats = generator.llm.cache.get_stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    print("LLM timings:")
+    print(generator.llm.router.format_stats(generator.llm.router.get_stats()))
+    scheduler = get_runtime().scheduler
+    print("LLM queues:")
+    print(scheduler.format_stats(scheduler.get_stats()))
     return filepath
 
 
@@ -194,6 +265,86 @@ def handle_take_exam(args):
     print(f"\nAttempt saved to: {filepath}")
 
 
+def handle_bench(args):
+    """Handle the bench command."""
+    from src.retrieval.benchmark import (run_hnsw_benchmark, format_benchmark_table,
+                                         run_compression_eval, format_compression_summary)
+    
+    if args.target == "compression":
+        ratio = args.ratio or config.CONTEXT_COMPRESSION_RATIO
+        print(f"Evaluating context compression (ratio {ratio}) with {args.sample} sample queries")
+        summary = run_compression_eval(sample_size=args.sample, ratio=ratio, answers=args.answers)
+        if not summary:
+            print("Vector database is empty. Please run the ingestion process first.")
+            return
+        print()
+        print(format_compression_summary(summary))
+        return
+    
+    print(f"Benchmarking retrieval with {args.sample} sample queries (recall@{args.k})")
+    print(f"Current settings: M={config.HNSW_M} ef_construction={config.HNSW_EF_CONSTRUCTION} "
+          f"ef_search={config.HNSW_EF_SEARCH}")
+    
+    rows = run_hnsw_benchmark(
+        ms=args.m,
+        ef_constructions=args.ef_construction,
+        ef_searches=args.ef_search,
+        sample_size=args.sample,
+        k=args.k
+    )
+    
+    if not rows:
+        print("Vector database is empty. Please run the ingestion process first.")
+        return
+    
+    print()
+    print(format_benchmark_table(rows, args.k))
+
+
+def handle_warmup(args):
+    """Handle the warmup command."""
+    from src.retrieval.llm_interface import OllamaInterface
+    from src.retrieval.retriever import Retriever
+    from src.retrieval.warmup import WarmupManager
+    
+    print(f"Warming up {config.LLM_MODEL} and {config.EMBEDDING_MODEL}...")
+    warmup = WarmupManager(OllamaInterface(), Retriever())
+    report = warmup.warm_up()
+    print(WarmupManager.format_report(report))
+    
+    if not args.keep_warm:
+        return
+    
+    start, end = config.KEEP_WARM_HOURS
+    print(f"Keeping models warm every {config.KEEP_WARM_INTERVAL_SECONDS}s between {start}:00 and {end}:00. "
+          "Press Ctrl+C to stop.")
+    warmup.start_keep_warm()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        warmup.stop()
+
+
+def handle_cache(args):
+    """Handle the cache command."""
+    from src.retrieval.llm_cache import get_response_cache
+    
+    cache = get_response_cache()
+    if cache is None:
+        print("LLM response cache is disabled (config.LLM_CACHE_ENABLED).")
+        return
+    
+    if args.action == "clear":
+        cache.clear()
+        print("LLM response cache cleared.")
+        return
+    
+    stats = cache.get_stats()
+    print(f"Cache file: {cache.path}")
+    print(f"Entries: {stats['entries']} ({stats['size_mb']:.1f} MB)")
+
+
 def main():
     """Main function for the CLI."""
     parser = setup_argparse()
@@ -207,6 +358,12 @@ def main():
         handle_exam_generation(args)
     elif args.command == "take":
         handle_take_exam(args)
+    elif args.command == "bench":
+        handle_bench(args)
+    elif args.command == "warmup":
+        handle_warmup(args)
+    elif args.command == "cache":
+        handle_cache(args)
     else:
         parser.print_help()
 
@@ -19,16 +19,109 @@ EMBEDDING_MODEL = "BAAI/bge-large-en"
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
 
+# Vector store settings
+VECTOR_STORE_BACKEND = "chroma"  # "chroma" (HNSW) or "numpy" (exact search over a memory-mapped float16 matrix)
+COLLECTION_NAME = "cissp_knowledge"
+HNSW_M = 16  # Graph out-degree for the Chroma backend (set at collection creation)
+HNSW_EF_CONSTRUCTION = 100  # Candidate list size while building the graph (set at collection creation)
+HNSW_EF_SEARCH = 10  # Candidate list size at query time; run `python cli.py bench retrieval` to tune
+NUMPY_STORE_SUBDIR = "numpy_store"  # Stored inside the vector database directory
+NUMPY_STORE_DTYPE = "float16"  # "float16" halves index memory; "float32" skips the upcast and is faster on CPU
+NUMPY_STORE_BLOCK_ROWS = 16384  # Rows scored at a time during exact search
+
 # Retrieval settings
 TOP_K = 5
 SIMILARITY_THRESHOLD = 0.75  # Threshold for contradiction detection
+RETRIEVAL_MODE = "hybrid"  # "vector" or "hybrid" (BM25 + vector, fused with reciprocal rank fusion)
+RRF_K = 60  # Rank offset used by reciprocal rank fusion
+MMR_ENABLED = True  # Diversify results with maximal marginal relevance
+MMR_FETCH_K = 20  # Candidates fetched before MMR selects the final TOP_K
+MMR_LAMBDA = 0.7  # MMR trade-off: 1.0 = pure relevance, 0.0 = pure diversity
+CONTEXT_TOKEN_BUDGET = 1200  # Maximum tokens of retrieved context sent to the LLM
+CHARS_PER_TOKEN = 4  # Rough characters-per-token ratio used for budgeting
+CONTEXT_COMPRESSION_ENABLED = False  # Keep only the packed sentences most similar to the query; see `bench compression`
+CONTEXT_COMPRESSION_RATIO = 0.5  # Fraction of the packed context's tokens kept by compression
+
+# Keyword (BM25) index settings
+KEYWORD_INDEX_FILE = "keyword_index.npz"  # Stored inside the vector database directory
+BM25_K1 = 1.5
+BM25_B = 0.75
 
 # LLM settings
 LLM_MODEL = "llama3.1:8b"  # Model to use with Ollama
-OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_CONNECT_TIMEOUT = 3.05  # Seconds to establish a connection to Ollama
+OLLAMA_READ_TIMEOUT = 120  # Seconds to wait for a generation to finish
+OLLAMA_HEALTH_TIMEOUT = 2  # Connect and read timeout for availability checks
+OLLAMA_HEALTH_TTL_SECONDS = 15  # How long an availability check is reused before a background refresh
+OLLAMA_CIRCUIT_FAILURE_THRESHOLD = 2  # Consecutive connection failures before calls fail fast
+OLLAMA_CIRCUIT_PROBE_INTERVAL = 5  # Seconds between recovery probes while Ollama is down
+OLLAMA_POOL_SIZE = 10  # Keep-alive connections kept open to Ollama
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))  # Match the server's OLLAMA_NUM_PARALLEL
+OLLAMA_MAX_RETRIES = 2  # Retries for connection errors and 429/5xx responses
+OLLAMA_RETRY_BACKOFF = 0.5  # Base delay in seconds; doubles per retry, with full jitter
+LLM_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded after each request
+
+# Model routing: tasks (named after their generation profile, plus "repair" for fixing
+# JSON that failed validation) that should use another model than LLM_MODEL.
+# A routed model that is not installed falls back to LLM_MODEL.
+LLM_AUX_MODEL = os.environ.get("LLM_AUX_MODEL", "llama3.2:3b")  # Small model for auxiliary calls
+LLM_ROUTES = {
+    "follow_ups": LLM_AUX_MODEL,
+    "repair": LLM_AUX_MODEL
+}
+
+# LLM scheduling: priority classes, highest first. Waiting requests are served by class,
+# then round-robin between users. Tasks not listed in LLM_TASK_PRIORITIES are interactive;
+# bulk jobs can also run under llm_scheduler.request_scope(priority="batch").
+LLM_PRIORITY_CLASSES = ["interactive", "batch"]
+LLM_TASK_PRIORITIES = {
+    "exam_question": "batch"
+}
+LLM_QUEUE_LIMITS = {"interactive": 32, "batch": 500}  # Waiting requests per class before new ones are rejected
+LLM_CLASS_MAX_SLOTS = {"batch": max(1, OLLAMA_NUM_PARALLEL - 1)}  # Keeps a slot free for interactive requests
+
+# Warm-up settings
+KEEP_WARM_INTERVAL_SECONDS = 10 * 60  # How often models are re-warmed in the background
+KEEP_WARM_HOURS = (8, 22)  # Local hours [start, end) during which models are kept warm
+
+# Generation budget profiles: Ollama `options` used by each kind of LLM call.
+# num_predict caps the output length; JSON-schema calls also end as soon as the object is complete.
+# Keep num_ctx the same in every profile, since Ollama reloads the model when it changes.
+LLM_NUM_CTX = 8192
+LLM_PROFILES = {
+    "default": {"num_ctx": LLM_NUM_CTX, "num_predict": 1024, "temperature": 0.7},
+    "answer": {"num_ctx": LLM_NUM_CTX, "num_predict": 1024, "temperature": 0.7, "top_k": 40},
+    "follow_ups": {"num_ctx": LLM_NUM_CTX, "num_predict": 200, "temperature": 0.7, "top_k": 40},
+    "exam_question": {"num_ctx": LLM_NUM_CTX, "num_predict": 700, "temperature": 0.7, "top_k": 40},
+    "review_question": {"num_ctx": LLM_NUM_CTX, "num_predict": 900, "temperature": 0.7, "top_k": 40}
+}
+
+# LLM response cache settings
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = DATA_DIR / "cache" / "llm_responses.sqlite3"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_MB = 100  # Least recently used responses are evicted beyond this size
+LLM_CACHE_DETERMINISTIC_TEMPERATURE = 0.2  # At or below this temperature one response per prompt is kept
+LLM_CACHE_VARIANTS = 3  # Responses kept (and served round-robin) per prompt at higher temperatures
+LLM_CACHE_SKIP_TASKS = ["exam_question", "review_question"]  # Generative tasks that need a fresh sample every call
+LLM_SINGLE_FLIGHT = True  # Identical concurrent calls share one in-flight generation
 
 # Tutoring settings
 MAX_HISTORY_LENGTH = 10  # Number of previous interactions to maintain in context
+TUTOR_CHAT_MODE = True  # Answer through /api/chat so earlier turns are reused as a cached prefix
+CHAT_HISTORY_TOKEN_BUDGET = 4096  # Prior turns kept in a chat; trimmed to half this size when exceeded
+QUERY_TOPIC_MIN_SCORE = 0.2  # Minimum query-to-domain similarity for a domain to count as a topic
+QUERY_TOPIC_MARGIN = 0.05  # Domains scoring within this of the best domain are also topics
+QUERY_MAX_TOPICS = 2
+FOLLOW_UP_WORKERS = 2  # Background threads generating follow-up questions after each answer
+
+# Semantic answer cache settings
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.95  # Minimum cosine similarity between questions for a cache hit
+ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+ANSWER_CACHE_MAX_ENTRIES = 1000
+
 import logging
 import os
 
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+"""
+Stub Ollama server for deterministic, offline load and latency testing.
+
+Implements the parts of Ollama's /api/generate, /api/chat and /api/tags
+endpoints that OllamaInterface uses, with configurable time-to-first-token,
+token rate, failure injection and canned or templated responses.
+
+Example:
+    python ollama_stub_server.py --port 11435 --ttft 0.3 --token_rate 40 --error_rate 0.05
+    OLLAMA_BASE_URL=http://localhost:11435 python cli.py ask "What is the CIA triad?"
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional
+
+
+DEFAULT_TEMPLATE = (
+    "This is a stub answer from {model}. The question was: {prompt_head} "
+    "According to [1], the key point is that security controls must balance confidentiality, "
+    "integrity and availability. Sources [1] and [2] describe this in more detail."
+)
+
+TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+def example_from_schema(schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Build a minimal value that satisfies a JSON schema.
+
+    Args:
+        schema: JSON schema (as sent in Ollama's `format` field)
+        root: Top-level schema used to resolve $ref pointers
+
+    Returns:
+        Value matching the schema
+    """
+    root = root or schema
+    if "$ref" in schema:
+        target = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            target = target[part]
+        return example_from_schema(target, root)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return example_from_schema(schema["anyOf"][0], root)
+
+    kind = schema.get("type", "string")
+    if kind == "object":
+        return {name: example_from_schema(prop, root) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        count = max(schema.get("minItems", 1), 1)
+        if "maxItems" in schema:
+            count = min(count, schema["maxItems"])
+        return [example_from_schema(schema.get("items", {}), root) for _ in range(count)]
+    if kind in ("integer", "number"):
+        return schema.get("minimum", 0)
+    if kind == "boolean":
+        return True
+
+    text = f"Stub {schema.get('title', 'text').lower()} about CISSP security concepts"
+    return text.ljust(schema.get("minLength", 0), ".")
+
+
+class StubBehaviour:
+    """
+    Latency, failure and response settings shared by all requests to a stub server.
+    """
+
+    def __init__(self, ttft: float = 0.2, token_rate: float = 50.0, error_rate: float = 0.0,
+                 error_status: int = 503, hang_rate: float = 0.0, hang_seconds: float = 30.0,
+                 responses: Optional[List[Dict[str, str]]] = None, template: str = DEFAULT_TEMPLATE,
+                 models: Optional[List[str]] = None, seed: Optional[int] = None):
+        """
+        Initialize the stub behaviour.
+
+        Args:
+            ttft: Seconds before the first token
+            token_rate: Tokens generated per second after the first
+            error_rate: Fraction of requests answered with `error_status`
+            error_status: HTTP status for injected failures
+            hang_rate: Fraction of requests that stall for `hang_seconds` before answering
+            hang_seconds: Stall duration for hung requests
+            responses: Canned responses, each {"match": regex, "response": template}
+            template: Response template when no canned response matches
+            models: Model names reported by /api/tags
+            seed: Random seed for reproducible failure injection
+        """
+        self.ttft = ttft
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.responses = [(re.compile(item["match"], re.IGNORECASE | re.DOTALL), item["response"])
+                          for item in responses or []]
+        self.template = template
+        self.models = models or ["llama3.1:8b"]
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "hangs": 0, "tokens": 0}
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.random.random() < rate
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += amount
+
+    def render(self, model: str, prompt: str, response_format: Any) -> str:
+        """
+        Produce the response text for a request.
+
+        Args:
+            model: Requested model
+            prompt: Prompt text (the last user message for chat requests)
+            response_format: Ollama `format` field, if any
+
+        Returns:
+            Response text
+        """
+        for pattern, template in self.responses:
+            if pattern.search(prompt):
+                return template.format(model=model, prompt=prompt, prompt_head=prompt.strip()[:80])
+        if isinstance(response_format, dict):
+            return json.dumps(example_from_schema(response_format))
+        if response_format == "json":
+            return json.dumps({"response": "stub"})
+        return self.template.format(model=model, prompt=prompt, prompt_head=prompt.strip()[:80])
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Request handler emulating Ollama's HTTP API.
+    """
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def behaviour(self) -> StubBehaviour:
+        return self.server.behaviour
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, body: Dict[str, Any]) -> None:
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": name, "model": name} for name in self.behaviour.models]})
+        elif self.path == "/stub/stats":
+            self._send_json(200, dict(self.behaviour.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        behaviour = self.behaviour
+        behaviour.count("requests")
+        model = request.get("model", behaviour.models[0])
+        if model not in behaviour.models:
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return
+
+        if behaviour.roll(behaviour.error_rate):
+            behaviour.count("errors")
+            self._send_json(behaviour.error_status, {"error": "injected failure"})
+            return
+        if behaviour.roll(behaviour.hang_rate):
+            behaviour.count("hangs")
+            time.sleep(behaviour.hang_seconds)
+
+        is_chat = self.path == "/api/chat"
+        if is_chat:
+            user_messages = [m.get("content", "") for m in request.get("messages", []) if m.get("role") == "user"]
+            prompt = user_messages[-1] if user_messages else ""
+        else:
+            prompt = request.get("prompt", "")
+
+        # An empty generate request only loads the model
+        if not is_chat and not prompt:
+            self._send_json(200, {"model": model, "created_at": self._now(), "response": "",
+                                  "done": True, "done_reason": "load"})
+            return
+
+        text = behaviour.render(model, prompt, request.get("format"))
+        tokens = TOKEN_PATTERN.findall(text) or [text]
+        num_predict = (request.get("options") or {}).get("num_predict")
+        done_reason = "stop"
+        if num_predict is not None and 0 <= num_predict < len(tokens):
+            tokens = tokens[:num_predict]
+            done_reason = "length"
+        behaviour.count("tokens", len(tokens))
+
+        start = time.perf_counter()
+        if request.get("stream", True):
+            self._stream(model, tokens, is_chat, done_reason, start)
+        else:
+            time.sleep(behaviour.ttft + max(len(tokens) - 1, 0) / behaviour.token_rate)
+            body = self._final_body(model, len(tokens), done_reason, start)
+            if is_chat:
+                body["message"] = {"role": "assistant", "content": "".join(tokens)}
+            else:
+                body["response"] = "".join(tokens)
+            self._send_json(200, body)
+
+    def _stream(self, model: str, tokens: List[str], is_chat: bool, done_reason: str, start: float) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            for i, token in enumerate(tokens):
+                time.sleep(self.behaviour.ttft if i == 0 else 1.0 / self.behaviour.token_rate)
+                chunk = {"model": model, "created_at": self._now(), "done": False}
+                if is_chat:
+                    chunk["message"] = {"role": "assistant", "content": token}
+                else:
+                    chunk["response"] = token
+                self._send_chunk(chunk)
+
+            body = self._final_body(model, len(tokens), done_reason, start)
+            if is_chat:
+                body["message"] = {"role": "assistant", "content": ""}
+            else:
+                body["response"] = ""
+            self._send_chunk(body)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client stopped reading
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _final_body(self, model: str, token_count: int, done_reason: str, start: float) -> Dict[str, Any]:
+        elapsed_ns = int((time.perf_counter() - start) * 1e9)
+        return {
+            "model": model,
+            "created_at": self._now(),
+            "done": True,
+            "done_reason": done_reason,
+            "total_duration": elapsed_ns,
+            "eval_count": token_count,
+            "eval_duration": elapsed_ns
+        }
+
+
+class StubOllamaServer:
+    """
+    Stub Ollama server that can run in the background of a benchmark or test.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11435, behaviour: StubBehaviour = None):
+        """
+        Initialize the stub server.
+
+        Args:
+            host: Interface to bind
+            port: Port to listen on (0 picks a free port)
+            behaviour: Latency, failure and response settings
+        """
+        self.httpd = ThreadingHTTPServer((host, port), StubOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.behaviour = behaviour or StubBehaviour()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self.httpd.behaviour.stats)
+
+    def start(self) -> "StubOllamaServer":
+        """
+        Serve requests on a background thread.
+
+        Returns:
+            The server, for chaining
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="ollama-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and close the socket.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    """Run the stub server from the command line."""
+    parser = argparse.ArgumentParser(description="Stub Ollama server for offline load and latency testing")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token_rate", type=float, default=50.0, help="Tokens per second after the first")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error_status", type=int, default=503, help="HTTP status for injected failures")
+    parser.add_argument("--hang_rate", type=float, default=0.0, help="Fraction of requests that stall")
+    parser.add_argument("--hang_seconds", type=float, default=30.0, help="Stall duration in seconds")
+    parser.add_argument("--responses", type=str, default=None,
+                        help='JSON file with canned responses: [{"match": regex, "response": template}]')
+    parser.add_argument("--template", type=str, default=DEFAULT_TEMPLATE,
+                        help="Default response template ({model}, {prompt}, {prompt_head})")
+    parser.add_argument("--model", type=str, nargs="+", default=["llama3.1:8b"], help="Model names to serve")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for failure injection")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, "r") as f:
+            responses = json.load(f)
+
+    behaviour = StubBehaviour(
+        ttft=args.ttft,
+        token_rate=args.token_rate,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        responses=responses,
+        template=args.template,
+        models=args.model,
+        seed=args.seed
+    )
+    server = StubOllamaServer(args.host, args.port, behaviour)
+    print(f"Stub Ollama server listening on {server.base_url} (models: {', '.join(args.model)})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping stub server")
+        server.httpd.server_close()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ Exam generator module for creating practice exams.
 import os
 import json
 import random
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import uuid
 
@@ -12,6 +12,8 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import config
 from src.retrieval.llm_interface import OllamaInterface, RAGPromptBuilder
+from src.retrieval.structured_output import MultipleChoiceQuestion
+from src.retrieval.domains import CISSP_DOMAINS
 from src.tutoring.tutor import AdaptiveLearning
 
 
@@ -370,16 +372,20 @@ class ExamGenerator:
         if not self.llm.is_available():
             print("Warning: Ollama LLM is not available. Please ensure it is running.")
     
-    def generate_question(self, topic: str, difficulty: float = 0.5) -> ExamQuestion:
+    def _build_question_prompt(self, topic: str, difficulty: float, focus: Optional[str] = None,
+                               number: int = 1, total: int = 1) -> Dict[str, Any]:
         """
-        Generate a single exam question.
+        Build the LLM call for generating an exam question.
         
         Args:
             topic: Topic/domain for the question
             difficulty: Difficulty level (0.0 to 1.0)
+            focus: Subtopic the question should test
+            number: Position of the question among those generated together on this topic
+            total: Number of questions generated together on this topic
             
         Returns:
-            Generated ExamQuestion
+            Keyword arguments for OllamaInterface.generate_structured
         """
         # Adjust the prompt based on difficulty
         difficulty_desc = "basic"
@@ -388,8 +394,17 @@ class ExamGenerator:
         elif difficulty > 0.3:
             difficulty_desc = "intermediate"
         
+        # Each question on a topic gets its own prompt; identical prompts would be
+        # coalesced into one generation and yield the same question
+        variation = ""
+        if focus:
+            variation += f"\nFocus the question on: {focus}."
+        if total > 1:
+            variation += (f"\nThis is question {number} of {total} on this topic; "
+                          f"test a different concept or scenario than the others.")
+        
         prompt = f"""
-Generate a {difficulty_desc} multiple-choice question for the CISSP exam on the topic of {topic}.
+Generate a {difficulty_desc} multiple-choice question for the CISSP exam on the topic of {topic}.{variation}
 
 The question should:
 1. Be clear and unambiguous
@@ -397,105 +412,109 @@ The question should:
 3. Have exactly one correct answer
 4. Include a detailed explanation of why the correct answer is right and why the others are wrong
 
-Format your response as a JSON object with these fields:
+Respond with a JSON object with these fields:
 - question_text: the question text
-- options: array of 4 option strings (starting with A, B, C, D)
+- options: array of the 4 option texts, in order A to D
 - correct_answer: the letter of the correct option (A, B, C, or D)
 - explanation: detailed explanation of the correct answer and why others are incorrect
 """
         
         system_prompt = "You are a CISSP exam question generator creating high-quality practice questions."
         
-        try:
-            result = self.llm.generate(prompt, system_prompt, temperature=0.7)
+        return {
+            "prompt": prompt,
+            "schema": MultipleChoiceQuestion,
+            "system_prompt": system_prompt,
+            "profile": "exam_question"
+        }
+    
+    @staticmethod
+    def _to_exam_question(output: MultipleChoiceQuestion, topic: str, difficulty: float) -> ExamQuestion:
+        """
+        Convert a validated LLM response into an exam question.
+        """
+        return ExamQuestion(
+            question_id=str(uuid.uuid4()),
+            question_text=output.question_text,
+            options=output.options,
+            correct_answer=output.correct_answer,
+            explanation=output.explanation,
+            topic=topic,
+            difficulty=difficulty
+        )
+    
+    def _question_prompts(self, specs: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """
+        Build a distinct LLM call for each question spec.
+        
+        Questions on a CISSP domain are spread over the subtopics listed in
+        the domain's description, in random order, and numbered within
+        their topic, so no two questions in a batch share a prompt.
+        """
+        totals: Dict[str, int] = {}
+        for topic, _ in specs:
+            totals[topic] = totals.get(topic, 0) + 1
+        
+        subtopics = {}
+        for topic in totals:
+            if topic in CISSP_DOMAINS:
+                names = [name.strip() for name in CISSP_DOMAINS[topic].rstrip(".").split(",")]
+                subtopics[topic] = random.sample(names, len(names))
+        
+        seen: Dict[str, int] = {}
+        calls = []
+        for topic, difficulty in specs:
+            index = seen.get(topic, 0)
+            seen[topic] = index + 1
+            focus = subtopics[topic][index % len(subtopics[topic])] if topic in subtopics else None
+            calls.append(self._build_question_prompt(topic, difficulty, focus, index + 1, totals[topic]))
+        return calls
+    
+    def generate_question(self, topic: str, difficulty: float = 0.5) -> Optional[ExamQuestion]:
+        """
+        Generate a single exam question.
+        
+        Args:
+            topic: Topic/domain for the question
+            difficulty: Difficulty level (0.0 to 1.0)
             
-            # Try to parse as JSON
-            try:
-                data = json.loads(result)
-                
-                # Create the question
-                question_id = str(uuid.uuid4())
-                return ExamQuestion(
-                    question_id=question_id,
-                    question_text=data["question_text"],
-                    options=data["options"],
-                    correct_answer=data["correct_answer"],
-                    explanation=data["explanation"],
-                    topic=topic,
-                    difficulty=difficulty
-                )
-            except json.JSONDecodeError:
-                # Fallback: extract question data using simple parsing
-                # This is a simplified version of the parsing in AdaptiveLearning.generate_review_question
-                lines = result.split('\n')
-                question_text = ""
-                options = []
-                correct_answer = ""
-                explanation = ""
-                
-                # Simple state machine for parsing
-                state = "question"
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    if state == "question" and line.startswith(("A)", "A.", "A:")):
-                        state = "options"
-                    
-                    if state == "question":
-                        question_text += line + " "
-                    elif state == "options":
-                        if line.startswith(("A)", "A.", "A:")):
-                            options.append(line)
-                        elif line.startswith(("B)", "B.", "B:")):
-                            options.append(line)
-                        elif line.startswith(("C)", "C.", "C:")):
-                            options.append(line)
-                        elif line.startswith(("D)", "D.", "D:")):
-                            options.append(line)
-                            state = "answer"
-                        elif line.lower().startswith("correct answer"):
-                            state = "answer"
-                            correct_answer = line.split(":")[-1].strip()
-                    elif state == "answer" and not correct_answer:
-                        if "correct" in line.lower() or "answer" in line.lower():
-                            correct_answer = line.split(":")[-1].strip()
-                            state = "explanation"
-                    elif state == "explanation" or (state == "answer" and correct_answer):
-                        explanation += line + " "
-                
-                # Create the question
-                question_id = str(uuid.uuid4())
-                return ExamQuestion(
-                    question_id=question_id,
-                    question_text=question_text.strip(),
-                    options=options or ["A) Option A", "B) Option B", "C) Option C", "D) Option D"],
-                    correct_answer=correct_answer or "A",
-                    explanation=explanation.strip() or "Explanation not available",
-                    topic=topic,
-                    difficulty=difficulty
-                )
-        
-        except Exception as e:
-            print(f"Error generating question: {e}")
+        Returns:
+            Generated ExamQuestion, or None if no valid question could be generated
+        """
+        output = self.llm.generate_structured(**self._build_question_prompt(topic, difficulty))
+        if output is None:
+            return None
+        return self._to_exam_question(output, topic, difficulty)
+    
+    def generate_questions(self, specs: List[Tuple[str, float]]) -> List[ExamQuestion]:
+        """
+        Generate several exam questions concurrently.
+        
+        The LLM calls run in parallel up to the Ollama server's capacity
+        (config.OLLAMA_NUM_PARALLEL) instead of one after another. Questions
+        that fail validation are regenerated once; any that still fail are
+        left out rather than replaced with placeholders.
+        
+        Args:
+            specs: (topic, difficulty) pair for each question
             
-            # Fallback question
-            question_id = str(uuid.uuid4())
-            return ExamQuestion(
-                question_id=question_id,
-                question_text=f"What is a key concept in {topic}?",
-                options=[
-                    "A) A placeholder option for demonstration",
-                    "B) A placeholder option for demonstration",
-                    "C) A placeholder option for demonstration",
-                    "D) A placeholder option for demonstration"
-                ],
-                correct_answer="A",
-                explanation="This is a placeholder question. Please try again later.",
-                topic=topic,
-                difficulty=difficulty
-            )
+        Returns:
+            Generated questions, in the order of `specs`
+        """
+        calls = self._question_prompts(specs)
+        outputs = self.llm.generate_structured_many(calls)
+        
+        failed = [i for i, output in enumerate(outputs) if output is None]
+        if failed:
+            retries = self.llm.generate_structured_many([calls[i] for i in failed])
+            for i, output in zip(failed, retries):
+                outputs[i] = output
+        
+        questions = [self._to_exam_question(output, topic, difficulty)
+                     for output, (topic, difficulty) in zip(outputs, specs) if output is not None]
+        if len(questions) < len(specs):
+            print(f"Warning: {len(specs) - len(questions)} question(s) could not be generated")
+        return questions
     
     def generate_exam(self, title: str, description: str = "", 
                       question_count: int = 10, time_limit_minutes: int = 120,
@@ -547,13 +566,12 @@ Format your response as a JSON object with these fields:
             questions_per_domain[domain] += 1
             remaining -= 1
         
-        # Generate questions for each domain
-        for domain, count in questions_per_domain.items():
-            for _ in range(count):
-                # Vary difficulty
-                difficulty = random.uniform(0.3, 0.9)
-                question = self.generate_question(domain, difficulty)
-                exam.add_question(question)
+        # Generate questions for each domain, with varied difficulty
+        specs = [(domain, random.uniform(0.3, 0.9))
+                 for domain, count in questions_per_domain.items()
+                 for _ in range(count)]
+        for question in self.generate_questions(specs):
+            exam.add_question(question)
         
         return exam
     
@@ -615,13 +633,16 @@ if __name__ == "__main__":
     print("Generating a sample question...")
     question = generator.generate_question("Security and Risk Management")
     
-    print(f"\nQuestion: {question.question_text}")
-    print("\nOptions:")
-    for option in question.options:
-        print(option)
-    
-    print(f"\nCorrect Answer: {question.correct_answer}")
-    print(f"\nExplanation: {question.explanation}")
+    if question is None:
+        print("Could not generate a valid question.")
+    else:
+        print(f"\nQuestion: {question.question_text}")
+        print("\nOptions:")
+        for option in question.options:
+            print(option)
+        
+        print(f"\nCorrect Answer: {question.correct_answer}")
+        print(f"\nExplanation: {question.explanation}")
     
     # Test generating a complete exam
     print("\nGenerating a sample exam...")
@@ -2,15 +2,17 @@
 Embedding generator module for creating and storing vector embeddings.
 """
 import os
+from pathlib import Path
 from typing import Dict, List, Any
 from tqdm import tqdm
-import chromadb
-from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import config
+from src.retrieval.keyword_index import KeywordIndex
+from src.retrieval.vector_store import get_vector_store
+from src.retrieval.domains import DomainTagger
 
 
 class EmbeddingGenerator:
@@ -31,18 +33,10 @@ class EmbeddingGenerator:
         
         # Initialize the embedding model
         self.model = SentenceTransformer(self.model_name)
+        self.domain_tagger = DomainTagger(self.model)
         
-        # Initialize ChromaDB
-        self.client = chromadb.PersistentClient(
-            path=str(self.db_dir),
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        # Create or get the collection
-        self.collection = self.client.get_or_create_collection(
-            name="cissp_knowledge",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # Open the configured vector store, creating it if needed
+        self.collection = get_vector_store(self.db_dir, create=True)
     
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -67,7 +61,7 @@ class EmbeddingGenerator:
             print("No documents to add")
             return
         
-        # Prepare data for ChromaDB
+        # Prepare data for the vector store
         ids = []
         texts = []
         metadatas = []
@@ -92,7 +86,11 @@ class EmbeddingGenerator:
             # Generate embeddings for this batch
             batch_embeddings = self.generate_embeddings(batch_texts)
             
-            # Add to ChromaDB
+            # Tag each chunk with its closest CISSP domain so searches can be scoped by domain
+            for metadata, domain in zip(batch_metadatas, self.domain_tagger.tag(batch_embeddings)):
+                metadata["cissp_domain"] = domain
+            
+            # Add to the vector store
             self.collection.add(
                 ids=batch_ids,
                 embeddings=batch_embeddings,
@@ -100,8 +98,25 @@ class EmbeddingGenerator:
                 metadatas=batch_metadatas
             )
         
+        self.collection.persist()
         print(f"Added {len(ids)} documents to the database")
     
+    def rebuild_keyword_index(self) -> int:
+        """
+        Rebuild the BM25 keyword index from every chunk in the collection.
+        
+        The index is stored next to the vector database so that both always
+        describe the same set of chunk IDs.
+        
+        Returns:
+            Number of chunks indexed
+        """
+        data = self.collection.get(include=["documents"])
+        index = KeywordIndex.build(data["ids"], data["documents"])
+        path = index.save(Path(self.db_dir) / config.KEYWORD_INDEX_FILE)
+        print(f"Saved keyword index with {len(index)} chunks to {path}")
+        return len(index)
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the collection.
@@ -46,6 +46,9 @@ def ingest_documents(doc_dir: Optional[Path] = None, force_reindex: bool = False
     if 'epub' in file_types:
         process_epubs(epub_processor, chunker, embedding_generator, force_reindex)
     
+    # Rebuild the keyword index so hybrid retrieval sees the new chunks
+    embedding_generator.rebuild_keyword_index()
+    
     # Print final stats
     stats = embedding_generator.get_collection_stats()
     print(f"\nIngestion complete. Collection stats: {stats}")
@@ -0,0 +1,301 @@
+"""
+Benchmark module for tuning HNSW index parameters and evaluating context compression.
+"""
+import os
+import re
+import json
+import time
+import random
+import itertools
+from pathlib import Path
+from typing import Dict, List, Any
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+from src.retrieval.vector_store import get_vector_store, hnsw_metadata, set_search_ef
+
+
+def load_sample_queries(sample_size: int, documents: List[str], seed: int = 0) -> List[str]:
+    """
+    Collect a sample of realistic queries.
+
+    Questions asked by users (saved in session files) are used first. If
+    there are not enough, the sample is topped up with short word spans taken
+    from random chunks of the corpus.
+
+    Args:
+        sample_size: Number of queries to return
+        documents: Chunk texts to draw synthetic queries from
+        seed: Random seed for reproducible samples
+
+    Returns:
+        List of query strings
+    """
+    rng = random.Random(seed)
+    queries = []
+
+    sessions_dir = Path(config.DATA_DIR) / "sessions"
+    for session_file in sorted(sessions_dir.glob("*.json")) if sessions_dir.exists() else []:
+        try:
+            with open(session_file, "r") as f:
+                history = json.load(f).get("interaction_history", [])
+            queries.extend(item["query"] for item in history if item.get("query"))
+        except (json.JSONDecodeError, OSError):
+            continue
+
+    queries = list(dict.fromkeys(queries))
+    rng.shuffle(queries)
+    queries = queries[:sample_size]
+
+    candidates = [doc for doc in documents if doc and len(doc.split()) >= 8]
+    while len(queries) < sample_size and candidates:
+        words = rng.choice(candidates).split()
+        start = rng.randrange(0, max(1, len(words) - 12))
+        queries.append(" ".join(words[start:start + 12]))
+
+    return queries
+
+
+def _percentile_ms(latencies: List[float], percentile: float) -> float:
+    return float(np.percentile(latencies, percentile) * 1000) if latencies else 0.0
+
+
+def _estimate_hnsw_bytes(count: int, dim: int, m: int) -> int:
+    """
+    Estimate HNSW index memory: float32 vectors, level-0 links (2M per node),
+    upper-level links and labels.
+    """
+    level0 = count * (dim * 4 + 2 * m * 4 + 4 + 8)
+    upper = int(count / max(np.log(m), 1.0)) * (m * 4 + 4)
+    return level0 + upper
+
+
+def run_hnsw_benchmark(ms: List[int], ef_constructions: List[int], ef_searches: List[int],
+                       sample_size: int = 100, k: int = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Sweep HNSW parameters against exact brute-force ground truth.
+
+    The stored corpus embeddings are loaded from the configured vector
+    store and an in-memory Chroma collection is built once per (M,
+    ef_construction); only ef_search is changed between query passes, so
+    its settings are compared on the same graph. Each sample query is
+    timed individually.
+
+    Args:
+        ms: Values of M to try
+        ef_constructions: Values of ef_construction to try
+        ef_searches: Values of ef_search to try
+        sample_size: Number of sample queries
+        k: Number of neighbours for recall@k (defaults to config.TOP_K)
+        seed: Random seed for the query sample
+
+    Returns:
+        One result row per setting, plus an exact-search baseline row
+    """
+    import chromadb
+    from chromadb.config import Settings
+    from sentence_transformers import SentenceTransformer
+
+    k = k or config.TOP_K
+
+    store = get_vector_store()
+    data = store.get(include=["documents", "embeddings"])
+    ids = data["ids"]
+    corpus = np.asarray(data["embeddings"], dtype=np.float32)
+    if not len(ids):
+        return []
+    corpus /= np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+
+    queries = load_sample_queries(sample_size, data["documents"], seed)
+    model = SentenceTransformer(config.EMBEDDING_MODEL)
+    query_vectors = np.asarray(model.encode(queries), dtype=np.float32)
+    query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+
+    # Exact ground truth, timed as the brute-force baseline
+    ground_truth = []
+    latencies = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        scores = corpus @ vector
+        top = np.argpartition(-scores, min(k, len(ids) - 1))[:k]
+        latencies.append(time.perf_counter() - start)
+        ground_truth.append({ids[i] for i in top})
+
+    rows = [{
+        "setting": "exact (numpy float32)",
+        "recall": 1.0,
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p95_ms": _percentile_ms(latencies, 95),
+        "index_mb": corpus.nbytes / (1024 ** 2)
+    }]
+
+    client = chromadb.Client(Settings(anonymized_telemetry=False))
+
+    def build(m: int, ef_construction: int, ef_search: int):
+        name = f"bench_m{m}_efc{ef_construction}"
+        collection = client.create_collection(name=name, metadata=hnsw_metadata(m, ef_construction, ef_search))
+        batch_size = 1000
+        for start in range(0, len(ids), batch_size):
+            collection.add(ids=ids[start:start + batch_size],
+                           embeddings=corpus[start:start + batch_size].tolist())
+        return collection
+
+    for m, ef_construction in itertools.product(ms, ef_constructions):
+        collection = build(m, ef_construction, ef_searches[0])
+        for ef_search in ef_searches:
+            if not set_search_ef(collection, ef_search):
+                # This Chroma release cannot change ef_search on a built index
+                client.delete_collection(collection.name)
+                collection = build(m, ef_construction, ef_search)
+
+            latencies = []
+            recalls = []
+            for vector, truth in zip(query_vectors, ground_truth):
+                start = time.perf_counter()
+                result = collection.query(query_embeddings=[vector.tolist()], n_results=k, include=["distances"])
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(truth & set(result["ids"][0])) / len(truth))
+
+            rows.append({
+                "setting": f"M={m} ef_construction={ef_construction} ef_search={ef_search}",
+                "recall": float(np.mean(recalls)),
+                "p50_ms": _percentile_ms(latencies, 50),
+                "p95_ms": _percentile_ms(latencies, 95),
+                "index_mb": _estimate_hnsw_bytes(len(ids), corpus.shape[1], m) / (1024 ** 2)
+            })
+        client.delete_collection(collection.name)
+
+    return rows
+
+
+def format_benchmark_table(rows: List[Dict[str, Any]], k: int) -> str:
+    """
+    Format benchmark rows as a plain-text table.
+
+    Args:
+        rows: Result rows from run_hnsw_benchmark
+        k: Number of neighbours used for recall
+
+    Returns:
+        Table string
+    """
+    header = f"{'Setting':<48} {f'Recall@{k}':>10} {'p50 ms':>9} {'p95 ms':>9} {'Index MB':>10}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['setting']:<48} {row['recall']:>10.3f} {row['p50_ms']:>9.2f} "
+            f"{row['p95_ms']:>9.2f} {row['index_mb']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _content_terms(text: str) -> set:
+    return {word for word in _WORD_PATTERN.findall(text.lower()) if len(word) > 3}
+
+
+def run_compression_eval(sample_size: int = 50, ratio: float = None, answers: bool = False,
+                         seed: int = 0) -> Dict[str, Any]:
+    """
+    Compare full and compressed context on sample queries.
+
+    For every query the retrieved results are packed twice, without and
+    with extractive compression, and the QA prompts are measured. Query
+    coverage is the share of the query's content words found in the full
+    context that the compressed context still contains. With `answers`,
+    both prompts are also answered by the LLM, and answer agreement is the
+    embedding similarity between the two answers.
+
+    Args:
+        sample_size: Number of sample queries
+        ratio: Compression ratio to evaluate (defaults to config.CONTEXT_COMPRESSION_RATIO)
+        answers: Also generate and compare answers (requires Ollama)
+        seed: Random seed for the query sample
+
+    Returns:
+        Dictionary of averaged metrics, or an empty dictionary if the database is empty
+    """
+    from src.retrieval.retriever import Retriever
+    from src.retrieval.llm_interface import OllamaInterface, RAGPromptBuilder
+    from src.retrieval.context_packer import estimate_tokens
+
+    retriever = Retriever()
+    if retriever.collection is None or not retriever.collection.count():
+        return {}
+
+    data = retriever.collection.get(include=["documents"])
+    queries = load_sample_queries(sample_size, data["documents"], seed)
+    query_embeddings = retriever.generate_embeddings(queries)
+    results = retriever.retrieve_many(queries, query_embeddings=query_embeddings)
+
+    rows = []
+    prompts = []
+    for query, embedding, query_results in zip(queries, query_embeddings, results):
+        full, _ = retriever.pack_context(query_results, compress=False)
+        start = time.perf_counter()
+        compressed, _ = retriever.pack_context(query_results, query_embedding=embedding, compress=True,
+                                               compression_ratio=ratio)
+        compress_seconds = time.perf_counter() - start
+
+        full_prompt = RAGPromptBuilder.build_qa_prompt(query, full)
+        compressed_prompt = RAGPromptBuilder.build_qa_prompt(query, compressed)
+        covered = _content_terms(query) & _content_terms(full)
+        rows.append({
+            "full_tokens": estimate_tokens(full_prompt),
+            "compressed_tokens": estimate_tokens(compressed_prompt),
+            "coverage": (len(covered & _content_terms(compressed)) / len(covered)) if covered else 1.0,
+            "compress_seconds": compress_seconds
+        })
+        prompts.append((full_prompt, compressed_prompt))
+
+    full_tokens = float(np.mean([row["full_tokens"] for row in rows]))
+    compressed_tokens = float(np.mean([row["compressed_tokens"] for row in rows]))
+    summary = {
+        "queries": len(rows),
+        "full_prompt_tokens": full_tokens,
+        "compressed_prompt_tokens": compressed_tokens,
+        "token_reduction": 1 - compressed_tokens / full_tokens if full_tokens else 0.0,
+        "query_coverage": float(np.mean([row["coverage"] for row in rows])),
+        "compress_p50_ms": _percentile_ms([row["compress_seconds"] for row in rows], 50),
+        "answer_agreement": None
+    }
+
+    if answers:
+        llm = OllamaInterface()
+        system_prompt = RAGPromptBuilder.build_system_prompt()
+        generated = llm.generate_many([
+            {"prompt": prompt, "system_prompt": system_prompt, "profile": "answer", "temperature": 0.0}
+            for pair in prompts for prompt in pair
+        ])
+        vectors = np.asarray(retriever.model.encode(generated), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        summary["answer_agreement"] = float(np.mean(np.sum(vectors[0::2] * vectors[1::2], axis=1)))
+
+    return summary
+
+
+def format_compression_summary(summary: Dict[str, Any]) -> str:
+    """
+    Format compression eval results for display.
+
+    Args:
+        summary: Metrics from run_compression_eval
+
+    Returns:
+        Summary string
+    """
+    lines = [
+        f"Queries:                   {summary['queries']}",
+        f"Prompt tokens, full:       {summary['full_prompt_tokens']:.0f}",
+        f"Prompt tokens, compressed: {summary['compressed_prompt_tokens']:.0f}",
+        f"Token reduction:           {summary['token_reduction']:.0%}",
+        f"Query coverage:            {summary['query_coverage']:.0%}",
+        f"Compression p50:           {summary['compress_p50_ms']:.1f} ms"
+    ]
+    if summary["answer_agreement"] is not None:
+        lines.append(f"Answer agreement:          {summary['answer_agreement']:.3f}")
+    return "\n".join(lines)
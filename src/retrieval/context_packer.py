@@ -0,0 +1,251 @@
+"""
+Context packing module for building compact, token-budgeted LLM context.
+"""
+import os
+import re
+from typing import Dict, List, Any, Tuple, Optional, Callable
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    return max(1, len(text) // config.CHARS_PER_TOKEN) if text else 0
+
+
+def merge_overlapping(first: str, second: str, min_overlap: int = 20) -> str:
+    """
+    Join two consecutive chunks, dropping the text they share.
+
+    Args:
+        first: Earlier chunk
+        second: Later chunk
+        min_overlap: Shortest shared span treated as an overlap
+
+    Returns:
+        Merged text
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+
+    max_overlap = min(len(first), len(second), config.CHUNK_OVERLAP * 2)
+    for size in range(max_overlap, min_overlap - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first} {second}"
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into a context string within a token budget.
+
+    Chunks from the same page are merged into passages (removing the text
+    repeated by chunk overlap), sentences already included elsewhere are
+    dropped, and passages are added in relevance order until the budget is
+    spent. Each packed passage gets its own citation number, and the
+    returned source list is aligned with those numbers.
+
+    Given the query embedding and an encoder, the packed sentences can also
+    be compressed extractively: they are embedded in one batch, and only
+    the ones most similar to the query are kept, up to a fraction of the
+    packed size. Kept sentences stay in their original order under their
+    passage's citation number.
+    """
+
+    def __init__(self, token_budget: int = None, compression_ratio: float = None):
+        """
+        Initialize the context packer.
+
+        Args:
+            token_budget: Maximum number of context tokens
+            compression_ratio: Fraction of packed tokens kept when compressing
+        """
+        self.token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        self.compression_ratio = compression_ratio or config.CONTEXT_COMPRESSION_RATIO
+
+    @staticmethod
+    def _section_key(metadata: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (
+            metadata.get("file_path") or metadata.get("title"),
+            metadata.get("page_number", metadata.get("chapter_number", metadata.get("section_number")))
+        )
+
+    def _build_passages(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Group results by page and merge overlapping or adjacent chunks.
+
+        Args:
+            results: Retrieved documents, most relevant first
+
+        Returns:
+            Passages, most relevant first
+        """
+        sections = {}
+        for rank, result in enumerate(results):
+            metadata = result.get("metadata") or {}
+            sections.setdefault(self._section_key(metadata), []).append((rank, result))
+
+        passages = []
+        for members in sections.values():
+            members.sort(key=lambda item: (item[1]["metadata"] or {}).get("chunk_id", 0))
+
+            run = None
+            for rank, result in members:
+                chunk_id = (result["metadata"] or {}).get("chunk_id")
+                adjacent = (run is not None and chunk_id is not None and run["last_chunk"] is not None
+                            and chunk_id - run["last_chunk"] <= 1)
+                if adjacent:
+                    run["text"] = merge_overlapping(run["text"], result["text"])
+                    run["rank"] = min(run["rank"], rank)
+                    run["last_chunk"] = chunk_id
+                else:
+                    run = {
+                        "text": result["text"],
+                        "metadata": result["metadata"],
+                        "rank": rank,
+                        "last_chunk": chunk_id
+                    }
+                    passages.append(run)
+
+        passages.sort(key=lambda passage: passage["rank"])
+        return passages
+
+    def _fill_budget(self, passages: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        Take deduplicated sentences from each passage, in relevance order, until the budget is spent.
+
+        Args:
+            passages: Passages from _build_passages
+
+        Returns:
+            Sentences kept from each passage (empty lists for passages left out)
+        """
+        seen_sentences = set()
+        remaining = self.token_budget
+        selections = []
+
+        for passage in passages:
+            kept = []
+            selections.append(kept)
+            if remaining <= 0:
+                continue
+
+            # Drop sentences that an earlier, more relevant passage already contains
+            sentences = []
+            for sentence in SENTENCE_PATTERN.split(passage["text"]):
+                normalized = " ".join(sentence.lower().split())
+                if not normalized or normalized in seen_sentences:
+                    continue
+                seen_sentences.add(normalized)
+                sentences.append(sentence.strip())
+
+            # Fill the remaining budget sentence by sentence
+            for sentence in sentences:
+                cost = estimate_tokens(sentence)
+                if cost > remaining:
+                    break
+                kept.append(sentence)
+                remaining -= cost
+
+        return selections
+
+    def compress(self, selections: List[List[str]], query_embedding: List[float],
+                 encode: Callable[[List[str]], Any]) -> List[List[str]]:
+        """
+        Keep only the sentences most similar to the query.
+
+        Args:
+            selections: Sentences kept from each passage
+            query_embedding: Embedding of the query
+            encode: Embeds a list of texts in one batch (e.g. SentenceTransformer.encode)
+
+        Returns:
+            Compressed sentences per passage, in their original order
+        """
+        flat = [(passage, sentence) for passage, sentences in enumerate(selections) for sentence in sentences]
+        if not flat:
+            return selections
+
+        costs = [estimate_tokens(sentence) for _, sentence in flat]
+        budget = int(sum(costs) * self.compression_ratio)
+
+        vectors = np.asarray(encode([sentence for _, sentence in flat]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+        order = np.argsort(-scores)
+        chosen = {int(order[0])}  # Always keep the best sentence, even if it alone exceeds the budget
+        remaining = budget - costs[order[0]]
+        for index in order[1:]:
+            if costs[index] > remaining:
+                break
+            chosen.add(int(index))
+            remaining -= costs[index]
+
+        compressed = [[] for _ in selections]
+        for index in sorted(chosen):
+            passage, sentence = flat[index]
+            compressed[passage].append(sentence)
+        return compressed
+
+    def pack(self, results: List[Dict[str, Any]], include_metadata: bool = True,
+             query_embedding: Optional[List[float]] = None,
+             encode: Optional[Callable[[List[str]], Any]] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Build the context string for the LLM.
+
+        Args:
+            results: Retrieved documents, most relevant first
+            include_metadata: Whether to include source titles and pages
+            query_embedding: Embedding of the query; with `encode`, enables compression
+            encode: Batch text encoder used to score sentences for compression
+
+        Returns:
+            Tuple of (context string, source metadata per citation number)
+        """
+        if not results:
+            return "No relevant information found.", []
+
+        passages = self._build_passages(results)
+        selections = self._fill_budget(passages)
+        if query_embedding is not None and encode is not None:
+            selections = self.compress(selections, query_embedding, encode)
+
+        context_parts = []
+        sources = []
+        for passage, kept in zip(passages, selections):
+            if not kept:
+                continue
+
+            text = " ".join(kept)
+            number = len(sources) + 1
+            metadata = passage["metadata"] or {}
+            if include_metadata:
+                source = f"{metadata.get('title', 'Unknown Source')}"
+                page = metadata.get('page_number', 'N/A')
+                context_parts.append(f"[{number}] From: {source}, Page: {page}\n{text}\n")
+            else:
+                context_parts.append(f"[{number}] {text}\n")
+            sources.append(metadata)
+
+        if not context_parts:
+            return "No relevant information found.", []
+
+        return "\n".join(context_parts), sources
@@ -0,0 +1,67 @@
+"""
+CISSP domain definitions and embedding-based domain tagging.
+"""
+from typing import Dict, List
+import numpy as np
+
+
+# The eight CISSP domains, each with a short description used as its embedding anchor
+CISSP_DOMAINS: Dict[str, str] = {
+    "Security and Risk Management":
+        "Security governance, risk management, risk assessment, compliance, legal and regulatory issues, "
+        "professional ethics, security policies, business continuity planning, threat modeling.",
+    "Asset Security":
+        "Information and asset classification, data ownership, data custodians, privacy protection, "
+        "data retention, data remanence, handling requirements, data security controls.",
+    "Security Architecture and Engineering":
+        "Secure design principles, security models such as Bell-LaPadula, Biba and Clark-Wilson, "
+        "cryptography, PKI, hardware security, vulnerabilities of architectures, physical security.",
+    "Communication and Network Security":
+        "Network architecture, OSI and TCP/IP models, secure network components, firewalls, VPNs, "
+        "wireless security, secure communication channels, network attacks.",
+    "Identity and Access Management":
+        "Identification, authentication, authorization, accountability, access control models, "
+        "single sign-on, federation, identity lifecycle, multi-factor authentication.",
+    "Security Assessment and Testing":
+        "Security assessments, vulnerability scanning, penetration testing, audits, log reviews, "
+        "security control testing, test coverage, key performance and risk indicators.",
+    "Security Operations":
+        "Investigations, logging and monitoring, incident response, disaster recovery, change management, "
+        "patch management, backups, resource protection, detective and preventive measures.",
+    "Software Development Security":
+        "Secure software development lifecycle, secure coding practices, application security testing, "
+        "software vulnerabilities, databases, OWASP, DevSecOps, acquired software security."
+}
+
+
+class DomainTagger:
+    """
+    Assigns CISSP domains to text embeddings by nearest domain description.
+    """
+
+    def __init__(self, model):
+        """
+        Initialize the domain tagger.
+
+        Args:
+            model: Loaded SentenceTransformer used for the corpus embeddings
+        """
+        self.domains = list(CISSP_DOMAINS)
+        anchors = np.asarray(model.encode(list(CISSP_DOMAINS.values())), dtype=np.float32)
+        self.anchors = anchors / np.maximum(np.linalg.norm(anchors, axis=1, keepdims=True), 1e-12)
+
+    def tag(self, embeddings: List[List[float]]) -> List[str]:
+        """
+        Pick the closest domain for each embedding.
+
+        Args:
+            embeddings: Embedding vectors
+
+        Returns:
+            Domain name per embedding
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if not len(vectors):
+            return []
+        best = np.argmax(vectors @ self.anchors.T, axis=1)
+        return [self.domains[i] for i in best]
@@ -0,0 +1,230 @@
+"""
+Keyword index module for BM25 search over chunk text.
+"""
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+# Keeps identifiers such as "800-53", "27001" and "bell-lapadula" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was",
+    "were", "what", "when", "which", "who", "why", "how", "with", "does", "do"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+
+    Compound identifiers are indexed both whole and by their parts, so
+    "SP 800-53" matches queries for "800-53" as well as "800 53".
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of terms
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if "-" in token or "." in token:
+            terms.extend(part for part in re.split(r"[-.]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+class KeywordIndex:
+    """
+    Compact in-process inverted index with BM25 scoring.
+
+    Postings are stored as flat NumPy arrays: for term t, the documents and
+    term frequencies live in `postings_docs[offsets[t]:offsets[t + 1]]` and
+    `postings_freqs[offsets[t]:offsets[t + 1]]`.
+    """
+
+    def __init__(self, doc_ids: List[str], terms: List[str], offsets: np.ndarray,
+                 postings_docs: np.ndarray, postings_freqs: np.ndarray, doc_lengths: np.ndarray,
+                 k1: float = None, b: float = None):
+        """
+        Initialize the keyword index from its compiled arrays.
+
+        Args:
+            doc_ids: Chunk IDs, matching the IDs in the vector database
+            terms: Vocabulary, in term-index order
+            offsets: Start offset of each term's postings (length len(terms) + 1)
+            postings_docs: Document indices for all postings
+            postings_freqs: Term frequencies for all postings
+            doc_lengths: Number of terms in each document
+            k1: BM25 term frequency saturation parameter
+            b: BM25 length normalization parameter
+        """
+        self.doc_ids = list(doc_ids)
+        self.positions = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        self.term_index = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings_docs = postings_docs
+        self.postings_freqs = postings_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1 or config.BM25_K1
+        self.b = b or config.BM25_B
+
+        # Document frequencies fall out of the offsets
+        self.doc_freqs = np.diff(offsets)
+
+        # Precompute per-document BM25 length normalization and per-term IDF
+        doc_count = len(self.doc_ids)
+        avg_length = float(doc_lengths.mean()) if doc_count else 0.0
+        self.length_norm = (self.k1 * (1 - self.b + self.b * doc_lengths / max(avg_length, 1e-9))).astype(np.float32)
+        self.idf = np.log(1 + (doc_count - self.doc_freqs + 0.5) / (self.doc_freqs + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, doc_ids: List[str], texts: List[str]) -> 'KeywordIndex':
+        """
+        Build an index over a collection of chunk texts.
+
+        Args:
+            doc_ids: Chunk IDs
+            texts: Chunk texts, in the same order as `doc_ids`
+
+        Returns:
+            Compiled KeywordIndex
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+
+        for doc_index, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            doc_lengths[doc_index] = sum(counts.values())
+            for term, freq in counts.items():
+                postings.setdefault(term, []).append((doc_index, freq))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+
+        postings_docs = np.empty(offsets[-1], dtype=np.int32)
+        postings_freqs = np.empty(offsets[-1], dtype=np.int32)
+        for i, term in enumerate(terms):
+            entries = np.asarray(postings[term], dtype=np.int32)
+            postings_docs[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            postings_freqs[offsets[i]:offsets[i + 1]] = entries[:, 1]
+
+        return cls(doc_ids, terms, offsets, postings_docs, postings_freqs, doc_lengths)
+
+    def save(self, path: Optional[Path] = None) -> str:
+        """
+        Persist the index to a single .npz file.
+
+        Args:
+            path: Destination file (defaults to KEYWORD_INDEX_FILE in config.DB_DIR)
+
+        Returns:
+            Path to the saved file
+        """
+        path = Path(path or config.DB_DIR / config.KEYWORD_INDEX_FILE)
+        os.makedirs(path.parent, exist_ok=True)
+
+        terms = sorted(self.term_index, key=self.term_index.get)
+        np.savez(
+            path,
+            doc_ids=np.array(self.doc_ids, dtype=str),
+            terms=np.array(terms, dtype=str),
+            offsets=self.offsets,
+            postings_docs=self.postings_docs,
+            postings_freqs=self.postings_freqs,
+            doc_lengths=self.doc_lengths
+        )
+        return str(path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> Optional['KeywordIndex']:
+        """
+        Load a persisted index.
+
+        Args:
+            path: Index file (defaults to KEYWORD_INDEX_FILE in config.DB_DIR)
+
+        Returns:
+            Loaded KeywordIndex, or None if no index has been built yet
+        """
+        path = Path(path or config.DB_DIR / config.KEYWORD_INDEX_FILE)
+        if not path.exists():
+            return None
+
+        with np.load(path) as data:
+            return cls(
+                doc_ids=data["doc_ids"].tolist(),
+                terms=data["terms"].tolist(),
+                offsets=data["offsets"],
+                postings_docs=data["postings_docs"],
+                postings_freqs=data["postings_freqs"],
+                doc_lengths=data["doc_lengths"]
+            )
+
+    def doc_mask(self, doc_ids: List[str]) -> np.ndarray:
+        """
+        Build a boolean mask selecting the given chunk IDs.
+
+        Args:
+            doc_ids: Chunk IDs to select
+
+        Returns:
+            Boolean array over the indexed documents
+        """
+        mask = np.zeros(len(self.doc_ids), dtype=bool)
+        rows = [self.positions[doc_id] for doc_id in doc_ids if doc_id in self.positions]
+        mask[rows] = True
+        return mask
+
+    def search(self, query: str, top_k: int = None,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """
+        Score documents against a query with BM25.
+
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            allowed: Optional boolean mask (see `doc_mask`) restricting which documents can match
+
+        Returns:
+            List of (chunk ID, BM25 score) pairs, best first
+        """
+        k = top_k or config.TOP_K
+        term_ids = [self.term_index[term] for term in set(tokenize(query)) if term in self.term_index]
+        if not term_ids or not self.doc_ids:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            freqs = self.postings_freqs[start:end].astype(np.float32)
+            # Each document appears at most once per term, so fancy-index accumulation is safe
+            scores[docs] += self.idf[term_id] * freqs * (self.k1 + 1) / (freqs + self.length_norm[docs])
+
+        if allowed is not None:
+            scores[~allowed] = 0.0
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        ranked = matched[np.argsort(-scores[matched])]
+
+        return [(self.doc_ids[i], float(scores[i])) for i in ranked]
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
@@ -0,0 +1,242 @@
+"""
+Persistent cache of LLM responses keyed by model, prompts and sampling options.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+class LLMResponseCache:
+    """
+    Disk-backed (SQLite) cache of LLM responses.
+
+    Each key holds a pool of responses. Low-temperature calls are treated
+    as deterministic and keep a single response; higher-temperature calls
+    keep up to `variants` responses, and once the pool is full its entries
+    are served round-robin so repeated calls still see some variety.
+    Entries expire after a TTL, and the least recently used entries are
+    evicted when the cache grows past its size limit.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: int = None, max_mb: float = None,
+                 variants: int = None, deterministic_temperature: float = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: SQLite database file
+            ttl_seconds: Lifetime of a cached response in seconds
+            max_mb: Maximum total size of cached responses in megabytes
+            variants: Responses kept per key for higher-temperature calls
+            deterministic_temperature: Temperature at or below which one response per key is kept
+        """
+        self.path = Path(path or config.LLM_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds or config.LLM_CACHE_TTL_SECONDS
+        self.max_bytes = int((max_mb or config.LLM_CACHE_MAX_MB) * 1024 * 1024)
+        self.variants = variants or config.LLM_CACHE_VARIANTS
+        self.deterministic_temperature = (config.LLM_CACHE_DETERMINISTIC_TEMPERATURE
+                                          if deterministic_temperature is None else deterministic_temperature)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT NOT NULL,
+                variant INTEGER NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (key, variant)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._next_variant: Dict[str, int] = {}  # Round-robin position per key
+        # Total response size, kept up to date on writes and recounted at each expiry sweep
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._next_sweep = 0.0
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, system_prompt: Optional[str], prompt: str,
+                 options: Dict[str, Any]) -> str:
+        """
+        Build the cache key for an LLM call.
+
+        Args:
+            model_name: Name of the LLM model
+            system_prompt: System prompt, if any
+            prompt: User prompt
+            options: Sampling options sent with the call
+
+        Returns:
+            Hex digest identifying the call
+        """
+        material = json.dumps({
+            "model": model_name,
+            "system": system_prompt or "",
+            "prompt": prompt,
+            "options": options
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def pool_size(self, temperature: float) -> int:
+        """
+        Number of responses kept for a call made at the given temperature.
+        """
+        return 1 if temperature <= self.deterministic_temperature else self.variants
+
+    def get(self, key: str, temperature: float) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Returns a miss until the key's pool is full, so high-temperature
+        calls keep generating fresh variants until there are enough.
+
+        Args:
+            key: Cache key from make_key
+            temperature: Sampling temperature of the call
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT variant, response FROM responses WHERE key = ? AND created_at >= ? ORDER BY variant",
+                (key, now - self.ttl_seconds)
+            ).fetchall()
+
+            if len(rows) < self.pool_size(temperature):
+                self.misses += 1
+                return None
+
+            position = self._next_variant.get(key, 0) % len(rows)
+            self._next_variant[key] = position + 1
+            variant, response = rows[position]
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ? AND variant = ?",
+                               (now, key, variant))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key: str, temperature: float, response: str) -> None:
+        """
+        Add a response to a key's pool, replacing the oldest variant if the pool is full.
+
+        Args:
+            key: Cache key from make_key
+            temperature: Sampling temperature of the call
+            response: Generated response
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT variant, created_at, size FROM responses WHERE key = ? ORDER BY variant", (key,)
+            ).fetchall()
+            expired = [variant for variant, created_at, _ in rows if created_at < now - self.ttl_seconds]
+            if expired:
+                variant = expired[0]
+            elif len(rows) < self.pool_size(temperature):
+                # Evicted variants leave gaps, so take the lowest free number
+                used = {row[0] for row in rows}
+                variant = next(number for number in range(len(rows) + 1) if number not in used)
+            else:
+                variant = min(rows, key=lambda row: row[1])[0]
+            replaced = next((row[2] for row in rows if row[0] == variant), 0)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, variant, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, variant, response, size, now, now)
+            )
+            self._total_bytes += size - replaced
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """
+        Drop expired responses, then the least recently used ones until under the size limit.
+
+        Expired responses are swept at most once a minute, which also
+        recounts the total size; in between, the running total is used.
+        """
+        if now >= self._next_sweep:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._next_sweep = now + min(60, self.ttl_seconds)
+        total = self._total_bytes
+        if total <= self.max_bytes:
+            return
+
+        for key, variant, size in self._conn.execute(
+                "SELECT key, variant, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ? AND variant = ?", (key, variant))
+            total -= size
+        self._total_bytes = total
+
+    def clear(self) -> None:
+        """
+        Remove all cached responses.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._next_variant.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with entry count, size, hits, misses and hit rate
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_mb": size / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Get the process-wide LLM response cache.
+
+    Returns:
+        Shared LLMResponseCache, or None if caching is disabled
+    """
+    global _cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
@@ -0,0 +1,194 @@
+"""
+Cached health checks and a circuit breaker for the LLM backend.
+"""
+import os
+import time
+import threading
+from typing import Dict, Any, Callable, Optional
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+class HealthMonitor:
+    """
+    Tracks whether an Ollama server is reachable, without blocking callers on a dead one.
+
+    Availability is cached for a short TTL and refreshed in the background
+    once stale; only the very first check waits for the server. The monitor
+    is also a circuit breaker: a failed health check, or several connection
+    failures in a row from real requests, opens the circuit. While it is
+    open, `allow_request` is False, so calls fail fast instead of waiting
+    for TCP timeouts. A background thread then probes the server and closes
+    the circuit as soon as it answers again.
+    """
+
+    def __init__(self, check: Callable[[], bool], ttl_seconds: float = None,
+                 failure_threshold: int = None, probe_interval: float = None):
+        """
+        Initialize the health monitor.
+
+        Args:
+            check: Returns True if the server answers a cheap request (must use a short timeout)
+            ttl_seconds: How long a health check result is reused
+            failure_threshold: Consecutive connection failures that open the circuit
+            probe_interval: Seconds between recovery probes while the circuit is open
+        """
+        self.check = check
+        self.ttl_seconds = ttl_seconds or config.OLLAMA_HEALTH_TTL_SECONDS
+        self.failure_threshold = failure_threshold or config.OLLAMA_CIRCUIT_FAILURE_THRESHOLD
+        self.probe_interval = probe_interval or config.OLLAMA_CIRCUIT_PROBE_INTERVAL
+
+        self.available: Optional[bool] = None
+        self.checked_at = 0.0
+        self.circuit_open = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.fast_failures = 0
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._prober: Optional[threading.Thread] = None
+
+    def is_available(self) -> bool:
+        """
+        Check whether the server is available, using the cached result when possible.
+
+        Returns:
+            True if the server is available, False otherwise
+        """
+        with self._lock:
+            available = self.available
+            stale = time.monotonic() - self.checked_at > self.ttl_seconds
+            refresh = available is not None and stale and not self.circuit_open and not self._refreshing
+            if refresh:
+                self._refreshing = True
+
+        if available is None:
+            return self.refresh()
+        if refresh:
+            threading.Thread(target=self._background_refresh, name="llm-health", daemon=True).start()
+        return available and not self.circuit_open
+
+    def refresh(self) -> bool:
+        """
+        Run a health check now and update the cached status.
+
+        Returns:
+            True if the server answered
+        """
+        healthy = self.check()
+        if healthy:
+            self.record_success()
+        else:
+            self._open("health check failed")
+        return healthy
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request should be sent, counting it as a fast failure if not.
+
+        Returns:
+            False while the circuit is open
+        """
+        with self._lock:
+            if self.circuit_open:
+                self.fast_failures += 1
+                return False
+            return True
+
+    def record_success(self) -> None:
+        """
+        Record that the server answered, closing the circuit if it was open.
+        """
+        with self._lock:
+            if self.circuit_open:
+                print("LLM backend is reachable again")
+            self.available = True
+            self.checked_at = time.monotonic()
+            self.circuit_open = False
+            self.consecutive_failures = 0
+
+    def record_failure(self, error: Any = None) -> None:
+        """
+        Record a connection failure, opening the circuit after too many in a row.
+
+        Args:
+            error: The failure, for logging
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            trip = self.consecutive_failures >= self.failure_threshold
+        if trip:
+            self._open(error)
+
+    def _open(self, reason: Any) -> None:
+        with self._lock:
+            self.available = False
+            self.checked_at = time.monotonic()
+            if self.circuit_open:
+                return
+            self.circuit_open = True
+            self.times_opened += 1
+            start_prober = self._prober is None or not self._prober.is_alive()
+            if start_prober:
+                self._prober = threading.Thread(target=self._probe_loop, name="llm-circuit-probe", daemon=True)
+        print(f"LLM backend unavailable ({reason}); failing fast and probing every {self.probe_interval}s")
+        if start_prober:
+            self._prober.start()
+
+    def _probe_loop(self) -> None:
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                if not self.circuit_open:
+                    return
+            if self.check():
+                self.record_success()
+                return
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the current health and circuit breaker status.
+
+        Returns:
+            Dictionary with availability, circuit state, age of the last check and failure counters
+        """
+        with self._lock:
+            return {
+                "available": bool(self.available) and not self.circuit_open,
+                "circuit": "open" if self.circuit_open else "closed",
+                "checked_seconds_ago": time.monotonic() - self.checked_at if self.available is not None else None,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "fast_failures": self.fast_failures
+            }
+
+
+_monitors: Dict[str, HealthMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_health_monitor(base_url: str, check: Callable[[], bool]) -> HealthMonitor:
+    """
+    Get the process-wide health monitor for an Ollama server.
+
+    Args:
+        base_url: Base URL of the server
+        check: Health check used if the monitor has to be created
+
+    Returns:
+        Shared HealthMonitor
+    """
+    with _monitors_lock:
+        if base_url not in _monitors:
+            _monitors[base_url] = HealthMonitor(check)
+        return _monitors[base_url]
@@ -3,79 +3,994 @@ LLM interface module for interacting with Ollama.
 """
 import os
 import json
+import time
+import logging
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+import httpx
 import requests
-from typing import Dict, List, Any, Optional
+from requests.adapters import HTTPAdapter
+from pydantic import BaseModel
+from typing import Dict, List, Any, Optional, Iterator, Callable, Type, Tuple
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import config
+from src.retrieval.llm_cache import LLMResponseCache, get_response_cache
+from src.retrieval.single_flight import SingleFlight
+from src.retrieval.model_router import ModelRouter, ModelNotFoundError
+from src.retrieval.llm_health import get_health_monitor
+from src.retrieval.llm_scheduler import LLMScheduler, QueueFullError, current_scope, run_in_scope, request_lane
+from src.retrieval.structured_output import SchemaT, parse_structured, build_repair_prompt
+
+logger = logging.getLogger(__name__)
+
+# httpx logs every request at INFO level, which floods the application log
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+# HTTP status codes treated as transient and retried
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Response returned when the scheduler rejects a call because its queue is full
+BUSY_RESPONSE = "Error: The tutor is busy right now. Please try again in a moment."
+
+
+class StreamInterruptedError(Exception):
+    """
+    Raised when a streamed response fails after it started, so the text received so far is incomplete.
+    """
+
+
+def unavailable_response(model_name: str) -> str:
+    """
+    Response returned when a generation fails or Ollama is known to be down.
+    """
+    return f"Error: Could not generate response. Please ensure Ollama is running with the {model_name} model loaded."
+
+# Pooled sessions shared by all interfaces talking to the same server
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url: str, pool_size: int = None) -> requests.Session:
+    """
+    Get the shared keep-alive session for an Ollama server.
+    
+    Args:
+        base_url: Base URL of the Ollama API
+        pool_size: Number of pooled connections (defaults to config.OLLAMA_POOL_SIZE)
+        
+    Returns:
+        Pooled requests session
+    """
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            pool_size = pool_size or config.OLLAMA_POOL_SIZE
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[base_url] = session
+        return session
+
+
+def check_ollama(base_url: str) -> bool:
+    """
+    Check whether an Ollama server answers, using the short health-check timeout.
+    
+    Args:
+        base_url: Base URL of the Ollama API
+        
+    Returns:
+        True if the server answered, False otherwise
+    """
+    try:
+        response = get_session(base_url).get(
+            f"{base_url}/api/tags",
+            timeout=(config.OLLAMA_HEALTH_TIMEOUT, config.OLLAMA_HEALTH_TIMEOUT)
+        )
+        response.raise_for_status()
+        return True
+    except requests.exceptions.RequestException:
+        return False
+
+
+def resolve_options(profile: str = "default", temperature: Optional[float] = None,
+                    max_tokens: Optional[int] = None,
+                    options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the Ollama `options` for a call from its budget profile.
+    
+    Args:
+        profile: Name of a profile in config.LLM_PROFILES
+        temperature: Overrides the profile's temperature
+        max_tokens: Overrides the profile's num_predict
+        options: Extra Ollama options, applied last
+        
+    Returns:
+        Ollama options dictionary
+        
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    if profile not in config.LLM_PROFILES:
+        raise ValueError(f"Unknown LLM profile: {profile}")
+    
+    resolved = dict(config.LLM_PROFILES[profile])
+    if temperature is not None:
+        resolved["temperature"] = temperature
+    if max_tokens is not None:
+        resolved["num_predict"] = max_tokens
+    resolved.update(options or {})
+    return resolved
+
+
+def build_generate_payload(model_name: str, prompt: str, system_prompt: Optional[str],
+                           options: Dict[str, Any], stream: bool,
+                           response_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the request body for Ollama's /api/generate endpoint.
+    
+    Args:
+        model_name: Name of the LLM model
+        prompt: User prompt
+        system_prompt: System prompt, if any
+        options: Ollama options (sampling and budget settings, see resolve_options)
+        stream: Whether the response should be streamed
+        response_format: JSON schema the response must follow, if any
+        
+    Returns:
+        Request payload
+    """
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "options": options,
+        "stream": stream,
+        "keep_alive": config.LLM_KEEP_ALIVE
+    }
+    
+    if response_format:
+        payload["format"] = response_format
+    
+    if system_prompt:
+        payload["system"] = system_prompt
+    
+    return payload
+
+
+def build_chat_payload(model_name: str, messages: List[Dict[str, str]],
+                       options: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+    """
+    Build the request body for Ollama's /api/chat endpoint.
+    
+    Args:
+        model_name: Name of the LLM model
+        messages: Conversation messages, as {"role", "content"} dictionaries
+        options: Ollama options (see resolve_options)
+        stream: Whether the response should be streamed
+        
+    Returns:
+        Request payload
+    """
+    return {
+        "model": model_name,
+        "messages": messages,
+        "options": options,
+        "stream": stream,
+        "keep_alive": config.LLM_KEEP_ALIVE
+    }
+
+
+def response_text(chunk: Dict[str, Any]) -> str:
+    """
+    Extract the generated text from a /api/generate or /api/chat response (or stream chunk).
+    """
+    if "message" in chunk:
+        return (chunk["message"] or {}).get("content", "")
+    return chunk.get("response", "")
+
+
+def payload_cache_key(payload: Dict[str, Any]) -> str:
+    """
+    Build the response cache key for a generate or chat payload.
+    
+    Everything except the model, prompts, stream flag and keep-alive counts
+    as a sampling option, so calls with different options never share responses.
+    
+    Args:
+        payload: Request payload from build_generate_payload or build_chat_payload
+        
+    Returns:
+        Cache key
+    """
+    options = {key: value for key, value in payload.items()
+               if key not in ("model", "prompt", "system", "messages", "stream", "keep_alive")}
+    prompt = payload["prompt"] if "prompt" in payload else json.dumps(payload["messages"])
+    return LLMResponseCache.make_key(payload["model"], payload.get("system"), prompt, options)
+
+
+def response_cache_for(cache: Optional[LLMResponseCache], task: str) -> Optional[LLMResponseCache]:
+    """
+    Get the response cache for a task, or None for tasks that must sample a fresh response every call.
+    
+    Args:
+        cache: Shared response cache (None if caching is disabled)
+        task: Task type (generation profile name)
+        
+    Returns:
+        Cache to use for the task's calls
+    """
+    return None if task in config.LLM_CACHE_SKIP_TASKS else cache
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given retry attempt.
+    """
+    return random.uniform(0, config.OLLAMA_RETRY_BACKOFF * (2 ** attempt))
+
+
+class LLMRuntime:
+    """
+    Process-wide event loop for LLM calls and the scheduler shared by all of them.
+    
+    Async calls run on a single background loop, so one LLMScheduler with
+    the server's OLLAMA_NUM_PARALLEL slots orders every generation in the
+    process by priority class and user, whether it comes from async code,
+    a worker thread or a blocking call through `slot()`. Calls handed to
+    the loop keep the caller's request scope. Identical calls that are already in
+    flight are coalesced: async callers await the same task through
+    `coalesce()`, and blocking callers share `flights`.
+    """
+    
+    def __init__(self, max_parallel: int = None):
+        """
+        Start the background event loop.
+        
+        Args:
+            max_parallel: Maximum concurrent generations (defaults to config.OLLAMA_NUM_PARALLEL)
+        """
+        self.max_parallel = max_parallel or config.OLLAMA_NUM_PARALLEL
+        self.scheduler = LLMScheduler(self.max_parallel)
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.flights = SingleFlight()
+        self.tasks: Dict[str, asyncio.Future] = {}  # In-flight async calls by key
+        self.coalesced = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="llm-runtime", daemon=True)
+        self.thread.start()
+    
+    def run(self, coro) -> Any:
+        """
+        Run a coroutine on the runtime loop and block until it finishes.
+        """
+        return asyncio.run_coroutine_threadsafe(run_in_scope(current_scope(), coro), self.loop).result()
+    
+    async def run_async(self, coro) -> Any:
+        """
+        Await a coroutine on the runtime loop from any event loop.
+        """
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(run_in_scope(current_scope(), coro), self.loop)
+        )
+    
+    def client(self, base_url: str) -> httpx.AsyncClient:
+        """
+        Get the pooled async HTTP client for an Ollama server (runtime loop only).
+        """
+        if base_url not in self.clients:
+            self.clients[base_url] = httpx.AsyncClient(
+                base_url=base_url,
+                limits=httpx.Limits(max_connections=config.OLLAMA_POOL_SIZE,
+                                    max_keepalive_connections=config.OLLAMA_POOL_SIZE)
+            )
+        return self.clients[base_url]
+    
+    async def coalesce(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Await the in-flight call for a key, starting it if there is none (runtime loop only).
+        
+        Args:
+            key: Identity of the call
+            factory: Returns the coroutine that performs the call
+            
+        Returns:
+            Result of the shared call
+        """
+        if not config.LLM_SINGLE_FLIGHT:
+            return await factory()
+        
+        task = self.tasks.get(key)
+        if task is None:
+            task = self.tasks[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda _: self.tasks.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so a cancelled caller does not cancel the call for everyone else
+        return await asyncio.shield(task)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get concurrency, queueing and coalescing statistics.
+        
+        Returns:
+            Dictionary with the parallel limit, coalesced call counts and
+            scheduler metrics per priority class
+        """
+        flights = self.flights.get_stats()
+        return {
+            "max_parallel": self.max_parallel,
+            "coalesced": self.coalesced + flights["coalesced"],
+            "in_flight": len(self.tasks) + flights["in_flight"],
+            "queues": self.scheduler.get_stats()
+        }
+    
+    @contextmanager
+    def slot(self, priority: str = None, user_id: Optional[str] = None):
+        """
+        Hold one of the shared generation slots in blocking code.
+        
+        Args:
+            priority: Priority class (defaults to the highest)
+            user_id: User the call is made for
+            
+        Raises:
+            QueueFullError: If the priority class has too many requests waiting
+        """
+        priority = priority or self.scheduler.classes[0]
+        self.run(self.scheduler.acquire(priority, user_id))
+        try:
+            yield
+        finally:
+            self.loop.call_soon_threadsafe(self.scheduler.release, priority)
+
+
+_runtime: Optional[LLMRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> LLMRuntime:
+    """
+    Get the process-wide LLM runtime, starting it on first use.
+    
+    Returns:
+        Shared LLMRuntime
+    """
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = LLMRuntime()
+        return _runtime
+
+
+class AsyncOllamaInterface:
+    """
+    Async interface for Ollama, built on a pooled httpx client.
+    
+    Calls can be awaited from any event loop; they execute on the shared
+    runtime loop and wait for a free generation slot, so independent
+    generations run concurrently up to the server's parallel capacity.
+    """
+    
+    def __init__(self, model_name: str = None, base_url: str = None,
+                 timeout: float = None, max_retries: int = None, router: ModelRouter = None):
+        """
+        Initialize the async Ollama interface.
+        
+        Args:
+            model_name: Name of the default LLM model
+            base_url: Base URL for the Ollama API
+            timeout: Read timeout in seconds for generation calls
+            max_retries: Number of retries for transient failures
+            router: Task-to-model routing (defaults to config.LLM_ROUTES)
+        """
+        self.model_name = model_name or config.LLM_MODEL
+        self.base_url = base_url or config.OLLAMA_BASE_URL
+        self.timeout = timeout or config.OLLAMA_READ_TIMEOUT
+        self.max_retries = config.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        self.router = router or ModelRouter(self.model_name)
+        self.health = get_health_monitor(self.base_url, lambda: check_ollama(self.base_url))
+        self.cache = get_response_cache()
+    
+    async def _post(self, path: str, payload: Dict[str, Any], task: str = "default") -> Dict[str, Any]:
+        """
+        POST to the Ollama API with a generation slot held, retrying transient failures.
+        
+        Raises:
+            httpx.HTTPError: If the request still fails after retrying
+            QueueFullError: If the scheduler rejects the call
+        """
+        runtime = get_runtime()
+        priority, user_id = request_lane(task)
+        client = runtime.client(self.base_url)
+        timeout = httpx.Timeout(self.timeout, connect=config.OLLAMA_CONNECT_TIMEOUT)
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with runtime.scheduler.slot(priority, user_id):
+                    response = await client.post(path, json=payload, timeout=timeout)
+                self.health.record_success()
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                if attempt == self.max_retries:
+                    self.health.record_failure(e)
+                    raise
+            
+            await asyncio.sleep(retry_delay(attempt))
+    
+    async def _generate(self, prompt: str, system_prompt: Optional[str], options: Dict[str, Any],
+                        response_format: Optional[Dict[str, Any]] = None,
+                        cacheable: Optional[Callable[[str], bool]] = None, task: str = "default") -> str:
+        start = time.perf_counter()
+        payload = build_generate_payload(self.router.model_for(task), prompt, system_prompt, options,
+                                         stream=False, response_format=response_format)
+        try:
+            answer = await self._generate_once(payload, cacheable, task)
+        except ModelNotFoundError:
+            payload = dict(payload, model=self.router.model_for(task))
+            answer = await self._generate_once(payload, cacheable, task)
+        
+        self.router.record(task, payload["model"], time.perf_counter() - start, ok=not answer.startswith("Error:"))
+        return answer
+    
+    async def _generate_once(self, payload: Dict[str, Any],
+                             cacheable: Optional[Callable[[str], bool]], task: str) -> str:
+        temperature = payload["options"].get("temperature", 0.0)
+        cache_key = payload_cache_key(payload)
+        cache = response_cache_for(self.cache, task)
+        if cache is not None:
+            cached = cache.get(cache_key, temperature)
+            if cached is not None:
+                return cached
+        
+        return await get_runtime().coalesce(
+            f"{self.base_url}/api/generate {cache_key}",
+            lambda: self._fetch(payload, cache_key, temperature, cacheable, task)
+        )
+    
+    async def _fetch(self, payload: Dict[str, Any], cache_key: str, temperature: float,
+                     cacheable: Optional[Callable[[str], bool]], task: str) -> str:
+        if not self.health.allow_request():
+            return unavailable_response(payload["model"])
+        try:
+            result = await self._post("/api/generate", payload, task)
+            answer = response_text(result)
+            cache = response_cache_for(self.cache, task)
+            if cache is not None and answer and (cacheable is None or cacheable(answer)):
+                cache.put(cache_key, temperature, answer)
+            return answer
+        except QueueFullError as e:
+            print(f"Rejected LLM request: {e}")
+            return BUSY_RESPONSE
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+                self.router.check_missing(payload["model"])
+            print(f"Error generating response: {e}")
+            return unavailable_response(payload["model"])
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                       profile: str = "default", options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate a response from the LLM.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for the LLM
+            temperature: Sampling temperature (0.0 to 1.0), overrides the profile
+            max_tokens: Maximum number of tokens to generate, overrides the profile
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
+            
+        Returns:
+            Generated text response
+        """
+        resolved = resolve_options(profile, temperature, max_tokens, options)
+        return await get_runtime().run_async(self._generate(prompt, system_prompt, resolved, task=profile))
+    
+    async def generate_many(self, calls: List[Dict[str, Any]]) -> List[str]:
+        """
+        Run independent generations concurrently.
+        
+        Args:
+            calls: Keyword arguments for `generate`, one dictionary per call
+            
+        Returns:
+            Generated responses, in the order of `calls`
+        """
+        return list(await asyncio.gather(*(self.generate(**call) for call in calls)))
+    
+    async def generate_structured(self, prompt: str, schema: Type[SchemaT],
+                                  system_prompt: Optional[str] = None, profile: str = "default",
+                                  options: Optional[Dict[str, Any]] = None) -> Optional[SchemaT]:
+        """
+        Generate a response constrained to a JSON schema and validate it.
+        
+        The schema is passed to Ollama as `format`, so the model can only
+        produce matching JSON. If the result still fails validation (e.g. a
+        value constraint or a truncated response), one repair request is
+        made with the validation errors before giving up.
+        
+        Args:
+            prompt: User prompt
+            schema: Pydantic model describing the expected response
+            system_prompt: System prompt for the LLM
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
+            
+        Returns:
+            Validated response, or None if generation failed
+        """
+        response_format = schema.model_json_schema()
+        is_valid = lambda text: parse_structured(text, schema) is not None
+        
+        resolved = resolve_options(profile, options=options)
+        result = await get_runtime().run_async(
+            self._generate(prompt, system_prompt, resolved, response_format, cacheable=is_valid, task=profile)
+        )
+        parsed = parse_structured(result, schema)
+        if parsed is not None or result.startswith("Error:"):
+            return parsed
+        
+        # One targeted repair attempt, deterministic so it sticks to the original content
+        repair_options = dict(resolved, temperature=0.0)
+        repaired = await get_runtime().run_async(
+            self._generate(build_repair_prompt(result, schema), system_prompt, repair_options,
+                           response_format, cacheable=is_valid, task="repair")
+        )
+        parsed = parse_structured(repaired, schema)
+        if parsed is None:
+            print(f"Could not generate a valid {schema.__name__} response")
+        return parsed
+    
+    async def generate_structured_many(self, calls: List[Dict[str, Any]]) -> List[Optional[BaseModel]]:
+        """
+        Run independent structured generations concurrently.
+        
+        Args:
+            calls: Keyword arguments for `generate_structured`, one dictionary per call
+            
+        Returns:
+            Validated responses (None where generation failed), in the order of `calls`
+        """
+        return list(await asyncio.gather(*(self.generate_structured(**call) for call in calls)))
 
 
 class OllamaInterface:
     """
     Interface for interacting with Ollama LLM.
+    
+    Requests go through a pooled keep-alive session with connect/read
+    timeouts. Connection errors and transient 429/5xx responses are retried
+    a bounded number of times with exponential backoff and full jitter.
+    Generations share the process-wide scheduler with
+    AsyncOllamaInterface, and `generate_many` runs independent prompts
+    concurrently through it. Each call's profile names its task, and the
+    router sends it to the model configured for that task (see
+    config.LLM_ROUTES), recording latency per route. A shared health
+    monitor caches availability and acts as a circuit breaker, so calls
+    fail fast while Ollama is down.
     """
     
-    def __init__(self, model_name: str = None, base_url: str = None):
+    def __init__(self, model_name: str = None, base_url: str = None,
+                 timeout: float = None, max_retries: int = None, routes: Optional[Dict[str, str]] = None):
         """
         Initialize the Ollama interface.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the default LLM model
             base_url: Base URL for the Ollama API
+            timeout: Read timeout in seconds for generation calls
+            max_retries: Number of retries for transient failures
+            routes: Task type to model name (defaults to config.LLM_ROUTES)
         """
         self.model_name = model_name or config.LLM_MODEL
         self.base_url = base_url or config.OLLAMA_BASE_URL
         self.api_url = f"{self.base_url}/api/generate"
+        self.chat_url = f"{self.base_url}/api/chat"
+        self.timeout = timeout or config.OLLAMA_READ_TIMEOUT
+        self.max_retries = config.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        self.session = get_session(self.base_url)
+        self.router = ModelRouter(self.model_name, routes)
+        self.async_llm = AsyncOllamaInterface(self.model_name, self.base_url, self.timeout, self.max_retries,
+                                              router=self.router)
+        self.health = self.async_llm.health
+        self.cache = get_response_cache()
+    
+    def _request(self, method: str, url: str, read_timeout: float = None,
+                 max_retries: int = None, **kwargs) -> requests.Response:
+        """
+        Send a request with timeouts and bounded, jittered retries.
+        
+        Read timeouts are not retried: a generation that timed out is likely
+        still running on the server, and repeating it would only add load.
+        
+        Args:
+            method: HTTP method
+            url: Request URL
+            read_timeout: Read timeout in seconds (defaults to the instance timeout)
+            max_retries: Number of retries (defaults to the instance setting)
+            **kwargs: Extra arguments for `requests.Session.request`
+            
+        Returns:
+            Successful response
+            
+        Raises:
+            requests.exceptions.RequestException: If the request still fails after retrying
+        """
+        timeout = (config.OLLAMA_CONNECT_TIMEOUT, read_timeout or self.timeout)
+        retries = self.max_retries if max_retries is None else max_retries
+        
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+                self.health.record_success()
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    response.raise_for_status()
+                    return response
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+                if attempt == retries:
+                    self.health.record_failure(e)
+                    raise
+            
+            time.sleep(retry_delay(attempt))
+    
+    def _complete(self, url: str, payload: Dict[str, Any], task: str = "default") -> str:
+        """
+        Send a non-streaming generate or chat request, serving it from the response cache when possible.
+        
+        Identical requests already in flight are joined instead of sent again.
+        """
+        start = time.perf_counter()
+        lane = request_lane(task)
+        try:
+            answer = self._complete_once(url, payload, task, lane)
+        except ModelNotFoundError:
+            payload = dict(payload, model=self.router.model_for(task))
+            answer = self._complete_once(url, payload, task, lane)
+        
+        self.router.record(task, payload["model"], time.perf_counter() - start, ok=not answer.startswith("Error:"))
+        return answer
+    
+    def _complete_once(self, url: str, payload: Dict[str, Any], task: str,
+                       lane: Tuple[str, Optional[str]]) -> str:
+        temperature = payload["options"].get("temperature", 0.0)
+        cache_key = payload_cache_key(payload)
+        cache = response_cache_for(self.cache, task)
+        if cache is not None:
+            cached = cache.get(cache_key, temperature)
+            if cached is not None:
+                return cached
+        
+        if not config.LLM_SINGLE_FLIGHT:
+            return self._fetch(url, payload, cache, cache_key, temperature, lane)
+        return get_runtime().flights.do(
+            f"{url} {cache_key}", lambda: self._fetch(url, payload, cache, cache_key, temperature, lane)
+        )
+    
+    def _fetch(self, url: str, payload: Dict[str, Any], cache: Optional[LLMResponseCache], cache_key: str,
+               temperature: float, lane: Tuple[str, Optional[str]]) -> str:
+        if not self.health.allow_request():
+            return unavailable_response(payload["model"])
+        try:
+            with get_runtime().slot(*lane):
+                response = self._request("POST", url, json=payload)
+            
+            answer = response_text(response.json())
+            if cache is not None and answer:
+                cache.put(cache_key, temperature, answer)
+            return answer
+        except QueueFullError as e:
+            print(f"Rejected LLM request: {e}")
+            return BUSY_RESPONSE
+        except requests.exceptions.RequestException as e:
+            if getattr(e.response, "status_code", None) == 404:
+                self.router.check_missing(payload["model"])
+            print(f"Error generating response: {e}")
+            return unavailable_response(payload["model"])
+    
+    def _complete_stream(self, url: str, payload: Dict[str, Any], task: str,
+                         lane: Tuple[str, Optional[str]]) -> Iterator[str]:
+        """
+        Send a streaming generate or chat request, yielding text fragments as they arrive.
+        
+        A caller that repeats a request already streaming attaches to it,
+        receiving the fragments produced so far and then the rest live.
+        The scheduling lane is passed in because the stream is consumed
+        lazily, possibly after the caller's request scope has ended.
+        
+        Raises:
+            StreamInterruptedError: If the stream fails after it started
+        """
+        start = time.perf_counter()
+        first_token_seconds = None
+        failed = False
+        fragments = self._complete_stream_once(url, payload, task, lane)
+        try:
+            while True:
+                try:
+                    fragment = next(fragments)
+                except ModelNotFoundError:
+                    payload = dict(payload, model=self.router.model_for(task))
+                    fragments = self._complete_stream_once(url, payload, task, lane)
+                    continue
+                except StopIteration:
+                    return
+                except StreamInterruptedError as e:
+                    logger.error(f"LLM stream interrupted: {e}")
+                    failed = True
+                    raise
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                    failed = fragment.startswith("Error:")
+                yield fragment
+        finally:
+            fragments.close()
+            self.router.record(task, payload["model"], time.perf_counter() - start, ok=not failed,
+                               first_token_seconds=first_token_seconds)
+    
+    def _complete_stream_once(self, url: str, payload: Dict[str, Any], task: str,
+                              lane: Tuple[str, Optional[str]]) -> Iterator[str]:
+        temperature = payload["options"].get("temperature", 0.0)
+        cache_key = payload_cache_key(payload)
+        cache = response_cache_for(self.cache, task)
+        if cache is not None:
+            cached = cache.get(cache_key, temperature)
+            if cached is not None:
+                yield cached
+                return
+        
+        if not config.LLM_SINGLE_FLIGHT:
+            yield from self._fetch_stream(url, payload, cache, cache_key, temperature, lane)
+            return
+        yield from get_runtime().flights.stream(
+            f"{url} {cache_key}", lambda: self._fetch_stream(url, payload, cache, cache_key, temperature, lane)
+        )
+    
+    def _fetch_stream(self, url: str, payload: Dict[str, Any], cache: Optional[LLMResponseCache],
+                      cache_key: str, temperature: float, lane: Tuple[str, Optional[str]]) -> Iterator[str]:
+        if not self.health.allow_request():
+            yield unavailable_response(payload["model"])
+            return
+        try:
+            with get_runtime().slot(*lane):
+                yield from self._stream_response(url, payload, cache, cache_key, temperature)
+        except QueueFullError as e:
+            logger.warning(f"Rejected LLM request: {e}")
+            yield BUSY_RESPONSE
+    
+    def _stream_response(self, url: str, payload: Dict[str, Any], cache: Optional[LLMResponseCache],
+                         cache_key: str, temperature: float) -> Iterator[str]:
+        parts = []
+        try:
+            response = self._request("POST", url, json=payload, stream=True)
+        except requests.exceptions.RequestException as e:
+            if getattr(e.response, "status_code", None) == 404:
+                self.router.check_missing(payload["model"])
+            logger.error(f"Error generating response: {e}")
+            yield unavailable_response(payload["model"])
+            return
+        
+        # Ollama streams one JSON object per line until "done" is set
+        with response:
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise StreamInterruptedError(chunk["error"])
+                    text = response_text(chunk)
+                    if text:
+                        parts.append(text)
+                        yield text
+                    if chunk.get("done"):
+                        # Only complete responses are cached
+                        if cache is not None and parts:
+                            cache.put(cache_key, temperature, "".join(parts))
+                        return
+            except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+                raise StreamInterruptedError(e) from e
+        # The connection closed without a final "done" chunk
+        raise StreamInterruptedError("stream ended before the response was complete")
     
     def generate(self, prompt: str, system_prompt: Optional[str] = None, 
-                 temperature: float = 0.7, max_tokens: int = 2048) -> str:
+                 temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                 profile: str = "default", options: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate a response from the LLM.
         
         Args:
             prompt: User prompt
             system_prompt: System prompt for the LLM
-            temperature: Sampling temperature (0.0 to 1.0)
-            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature (0.0 to 1.0), overrides the profile
+            max_tokens: Maximum number of tokens to generate, overrides the profile
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
             
         Returns:
             Generated text response
         """
+        options = resolve_options(profile, temperature, max_tokens, options)
+        payload = build_generate_payload(self.router.model_for(profile), prompt, system_prompt, options,
+                                         stream=False)
+        return self._complete(self.api_url, payload, profile)
+    
+    def generate_many(self, calls: List[Dict[str, Any]]) -> List[str]:
+        """
+        Run independent generations concurrently, bounded by the server's parallel capacity.
+        
+        Args:
+            calls: Keyword arguments for `generate`, one dictionary per call
+            
+        Returns:
+            Generated responses, in the order of `calls`
+        """
+        return get_runtime().run(self.async_llm.generate_many(calls))
+    
+    def generate_structured(self, prompt: str, schema: Type[SchemaT],
+                            system_prompt: Optional[str] = None, profile: str = "default",
+                            options: Optional[Dict[str, Any]] = None) -> Optional[SchemaT]:
+        """
+        Generate a response constrained to a JSON schema and validate it.
+        
+        See AsyncOllamaInterface.generate_structured.
+        
+        Args:
+            prompt: User prompt
+            schema: Pydantic model describing the expected response
+            system_prompt: System prompt for the LLM
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
+            
+        Returns:
+            Validated response, or None if generation failed
+        """
+        return get_runtime().run(self.async_llm.generate_structured(
+            prompt, schema, system_prompt, profile, options
+        ))
+    
+    def generate_structured_many(self, calls: List[Dict[str, Any]]) -> List[Optional[BaseModel]]:
+        """
+        Run independent structured generations concurrently.
+        
+        Args:
+            calls: Keyword arguments for `generate_structured`, one dictionary per call
+            
+        Returns:
+            Validated responses (None where generation failed), in the order of `calls`
+        """
+        return get_runtime().run(self.async_llm.generate_structured_many(calls))
+    
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                        temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                        profile: str = "default", options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Generate a response from the LLM, yielding text as it is produced.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt for the LLM
+            temperature: Sampling temperature (0.0 to 1.0), overrides the profile
+            max_tokens: Maximum number of tokens to generate, overrides the profile
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
+            
+        Yields:
+            Text fragments of the response, in order
+            
+        Raises:
+            StreamInterruptedError: If the stream fails after it started
+        """
+        options = resolve_options(profile, temperature, max_tokens, options)
+        payload = build_generate_payload(self.router.model_for(profile), prompt, system_prompt, options,
+                                         stream=True)
+        return self._complete_stream(self.api_url, payload, profile, request_lane(profile))
+    
+    def chat(self, messages: List[Dict[str, str]], temperature: Optional[float] = None,
+             max_tokens: Optional[int] = None, profile: str = "default",
+             options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate the next assistant message of a conversation via /api/chat.
+        
+        Keep earlier messages byte-for-byte identical between turns: the
+        server reuses its KV cache for the longest shared prefix, so only
+        the new messages need to be processed.
+        
+        Args:
+            messages: Conversation so far, as {"role", "content"} dictionaries
+            temperature: Sampling temperature (0.0 to 1.0), overrides the profile
+            max_tokens: Maximum number of tokens to generate, overrides the profile
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
+            
+        Returns:
+            Generated assistant message
+        """
+        options = resolve_options(profile, temperature, max_tokens, options)
+        payload = build_chat_payload(self.router.model_for(profile), messages, options, stream=False)
+        return self._complete(self.chat_url, payload, profile)
+    
+    def chat_stream(self, messages: List[Dict[str, str]], temperature: Optional[float] = None,
+                    max_tokens: Optional[int] = None, profile: str = "default",
+                    options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Stream the next assistant message of a conversation via /api/chat.
+        
+        Args:
+            messages: Conversation so far, as {"role", "content"} dictionaries
+            temperature: Sampling temperature (0.0 to 1.0), overrides the profile
+            max_tokens: Maximum number of tokens to generate, overrides the profile
+            profile: Generation budget profile (see config.LLM_PROFILES)
+            options: Extra Ollama options
+            
+        Yields:
+            Text fragments of the assistant message, in order
+            
+        Raises:
+            StreamInterruptedError: If the stream fails after it started
+        """
+        options = resolve_options(profile, temperature, max_tokens, options)
+        payload = build_chat_payload(self.router.model_for(profile), messages, options, stream=True)
+        return self._complete_stream(self.chat_url, payload, profile, request_lane(profile))
+    
+    def preload(self, keep_alive: Optional[str] = None, model_name: Optional[str] = None) -> bool:
+        """
+        Load a model into Ollama's memory without generating anything.
+        
+        The model is loaded with the same num_ctx as the generation
+        profiles, so the first real request does not trigger a reload.
+        A routed model that is not installed is marked missing, so its
+        tasks go to the default model.
+        
+        Args:
+            keep_alive: How long Ollama keeps the model loaded (defaults to config.LLM_KEEP_ALIVE)
+            model_name: Model to load (defaults to the default model)
+            
+        Returns:
+            True if the model is loaded, False otherwise
+        """
+        model_name = model_name or self.model_name
         payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "stream": False
+            "model": model_name,
+            "prompt": "",
+            "options": {"num_ctx": config.LLM_NUM_CTX},
+            "stream": False,
+            "keep_alive": keep_alive or config.LLM_KEEP_ALIVE
         }
         
-        if system_prompt:
-            payload["system"] = system_prompt
-        
+        if not self.health.allow_request():
+            return False
         try:
-            response = requests.post(self.api_url, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result.get("response", "")
+            self._request("POST", self.api_url, json=payload)
+            return True
         except requests.exceptions.RequestException as e:
-            print(f"Error generating response: {e}")
-            return f"Error: Could not generate response. Please ensure Ollama is running with the {self.model_name} model loaded."
+            if getattr(e.response, "status_code", None) == 404:
+                self.router.mark_missing(model_name)
+            print(f"Error preloading model {model_name}: {e}")
+            return False
     
     def is_available(self) -> bool:
         """
         Check if Ollama is available.
         
+        The result is cached for a short TTL and refreshed in the background,
+        so this only waits on the server the first time it is called.
+        
         Returns:
             True if Ollama is available, False otherwise
         """
-        try:
-            response = requests.get(f"{self.base_url}/api/tags")
-            response.raise_for_status()
-            return True
-        except requests.exceptions.RequestException:
-            return False
+        return self.health.is_available()
 
 
 class RAGPromptBuilder:
@@ -0,0 +1,270 @@
+"""
+Priority scheduling of LLM generation slots with per-user fairness and backpressure.
+"""
+import os
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a request is rejected because its priority class already has too many waiting.
+    """
+
+
+_request_scope: contextvars.ContextVar = contextvars.ContextVar("llm_request_scope", default={})
+
+
+@contextmanager
+def request_scope(user_id: Optional[str] = None, priority: Optional[str] = None):
+    """
+    Attribute the LLM calls made inside the block to a user and, optionally, a priority class.
+
+    Args:
+        user_id: User the calls are made for; calls are shared fairly between users
+        priority: Priority class overriding the one configured for each task
+    """
+    scope = dict(_request_scope.get())
+    if user_id is not None:
+        scope["user_id"] = user_id
+    if priority is not None:
+        scope["priority"] = priority
+    token = _request_scope.set(scope)
+    try:
+        yield
+    finally:
+        _request_scope.reset(token)
+
+
+def current_scope() -> Dict[str, Any]:
+    """
+    Get the request scope of the calling code.
+    """
+    return _request_scope.get()
+
+
+async def run_in_scope(scope: Dict[str, Any], coro) -> Any:
+    """
+    Await a coroutine with the given request scope, e.g. after handing it to another event loop.
+    """
+    token = _request_scope.set(scope)
+    try:
+        return await coro
+    finally:
+        _request_scope.reset(token)
+
+
+def request_lane(task: str) -> Tuple[str, Optional[str]]:
+    """
+    Get the priority class and user for an LLM call made by the calling code.
+
+    Args:
+        task: Task type (generation profile name)
+
+    Returns:
+        Tuple of (priority class, user ID or None)
+    """
+    scope = current_scope()
+    priority = scope.get("priority") or config.LLM_TASK_PRIORITIES.get(task, config.LLM_PRIORITY_CLASSES[0])
+    return priority, scope.get("user_id")
+
+
+class LLMScheduler:
+    """
+    Hands out a fixed number of generation slots by priority class.
+
+    Waiting requests are served strictly by class, highest first, and
+    round-robin between users within a class, so one user's burst cannot
+    delay everyone else's. Classes can be capped below the total number of
+    slots, which keeps a slot free for interactive requests while batch
+    jobs run. When a class already has its maximum number of requests
+    waiting, new ones are rejected immediately with QueueFullError.
+
+    All methods except `get_stats` must be called on the event loop that
+    owns the scheduler.
+    """
+
+    def __init__(self, max_parallel: int = None, classes: Optional[List[str]] = None,
+                 queue_limits: Optional[Dict[str, int]] = None,
+                 class_slots: Optional[Dict[str, int]] = None, window: int = 1000):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_parallel: Total generation slots (defaults to config.OLLAMA_NUM_PARALLEL)
+            classes: Priority classes, highest first (defaults to config.LLM_PRIORITY_CLASSES)
+            queue_limits: Maximum waiting requests per class (defaults to config.LLM_QUEUE_LIMITS)
+            class_slots: Maximum concurrent generations per class (defaults to config.LLM_CLASS_MAX_SLOTS)
+            window: Number of recent queue waits kept per class for metrics
+        """
+        self.max_parallel = max_parallel or config.OLLAMA_NUM_PARALLEL
+        self.classes = list(classes or config.LLM_PRIORITY_CLASSES)
+        limits = config.LLM_QUEUE_LIMITS if queue_limits is None else queue_limits
+        slots = config.LLM_CLASS_MAX_SLOTS if class_slots is None else class_slots
+        self.queue_limits = {name: limits.get(name) for name in self.classes}
+        self.class_slots = {name: min(slots.get(name, self.max_parallel), self.max_parallel)
+                            for name in self.classes}
+
+        self.active = 0
+        self.active_by_class = {name: 0 for name in self.classes}
+        # Per class: user -> FIFO of (future, enqueued_at); users are served round-robin
+        self.queues: Dict[str, OrderedDict] = {name: OrderedDict() for name in self.classes}
+        self.waiting = {name: 0 for name in self.classes}
+
+        self.served = {name: 0 for name in self.classes}
+        self.rejected = {name: 0 for name in self.classes}
+        self.waits = {name: deque(maxlen=window) for name in self.classes}
+
+    def _check_class(self, priority: str) -> None:
+        if priority not in self.queues:
+            raise ValueError(f"Unknown LLM priority class '{priority}'. Available: {', '.join(self.classes)}")
+
+    async def acquire(self, priority: str, user_id: Optional[str] = None) -> None:
+        """
+        Wait for a generation slot.
+
+        Args:
+            priority: Priority class of the request
+            user_id: User the request is made for
+
+        Raises:
+            QueueFullError: If the class already has its maximum number of requests waiting
+        """
+        self._check_class(priority)
+        limit = self.queue_limits[priority]
+        if limit is not None and self.waiting[priority] >= limit:
+            self.rejected[priority] += 1
+            raise QueueFullError(f"Too many {priority} LLM requests waiting ({limit})")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.perf_counter())
+        self.queues[priority].setdefault(user_id, deque()).append(entry)
+        self.waiting[priority] += 1
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(priority)  # Granted just before the caller gave up
+            else:
+                self._remove(priority, user_id, entry)
+            raise
+
+    def _remove(self, priority: str, user_id: Optional[str], entry: Tuple[asyncio.Future, float]) -> None:
+        users = self.queues[priority]
+        entries = users.get(user_id)
+        if entries is not None and entry in entries:
+            entries.remove(entry)
+            self.waiting[priority] -= 1
+            if not entries:
+                del users[user_id]
+
+    def release(self, priority: str) -> None:
+        """
+        Return a slot and hand it to the next waiting request.
+
+        Args:
+            priority: Priority class the slot was acquired for
+        """
+        self.active -= 1
+        self.active_by_class[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.active < self.max_parallel:
+            for priority in self.classes:
+                if self.waiting[priority] and self.active_by_class[priority] < self.class_slots[priority]:
+                    self._grant(priority)
+                    break
+            else:
+                return
+
+    def _grant(self, priority: str) -> None:
+        """
+        Hand a slot to the next live waiter of a class, dropping waiters cancelled in the meantime.
+
+        A waiter's future can be cancelled before `acquire` gets to remove
+        it from the queue; such entries are discarded without using a slot.
+        """
+        users = self.queues[priority]
+        while users:
+            user_id, entries = next(iter(users.items()))
+            future, enqueued_at = entries.popleft()
+            self.waiting[priority] -= 1
+            if entries:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+
+            if future.done():
+                continue
+            future.set_result(None)
+            self.active += 1
+            self.active_by_class[priority] += 1
+            self.served[priority] += 1
+            self.waits[priority].append(time.perf_counter() - enqueued_at)
+            return
+
+    @asynccontextmanager
+    async def slot(self, priority: str, user_id: Optional[str] = None):
+        """
+        Hold a generation slot for the duration of the block.
+
+        Args:
+            priority: Priority class of the request
+            user_id: User the request is made for
+        """
+        await self.acquire(priority, user_id)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get queue and wait-time metrics per priority class.
+
+        Returns:
+            Dictionary mapping each class to its active, waiting, served and
+            rejected counts and its mean/p95 queue wait over recent requests
+        """
+        stats = {}
+        for priority in self.classes:
+            waits = list(self.waits[priority])
+            stats[priority] = {
+                "active": self.active_by_class[priority],
+                "waiting": self.waiting[priority],
+                "served": self.served[priority],
+                "rejected": self.rejected[priority],
+                "mean_wait_ms": float(np.mean(waits) * 1000) if waits else 0.0,
+                "p95_wait_ms": float(np.percentile(waits, 95) * 1000) if waits else 0.0
+            }
+        return stats
+
+    @staticmethod
+    def format_stats(stats: Dict[str, Dict[str, Any]]) -> str:
+        """
+        Format scheduler metrics for display.
+
+        Args:
+            stats: Metrics from get_stats
+
+        Returns:
+            Human-readable summary, one line per priority class
+        """
+        return "\n".join(
+            f"{priority:<12} {entry['served']:>5} served {entry['rejected']:>4} rejected "
+            f"{entry['waiting']:>4} waiting  queue wait mean {entry['mean_wait_ms']:.0f} ms  "
+            f"p95 {entry['p95_wait_ms']:.0f} ms"
+            for priority, entry in stats.items()
+        )
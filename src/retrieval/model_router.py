@@ -0,0 +1,168 @@
+"""
+Routing of LLM tasks to models, with per-route latency metrics.
+"""
+import os
+import threading
+from typing import Dict, List, Any, Optional
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+class ModelNotFoundError(Exception):
+    """
+    Raised when the server does not have a routed model and the call should use the default model.
+    """
+
+
+class ModelRouter:
+    """
+    Maps task types to Ollama models and records latency per route.
+
+    Tasks are named after their generation profile ("answer", "follow_ups",
+    ...). Tasks listed in the routes go to their own model, typically a
+    small one for auxiliary work; every other task goes to the default
+    model. A routed model the server does not have is marked missing, and
+    its tasks fall back to the default model from then on.
+    """
+
+    def __init__(self, default_model: str = None, routes: Optional[Dict[str, str]] = None):
+        """
+        Initialize the router.
+
+        Args:
+            default_model: Model for tasks without a route (defaults to config.LLM_MODEL)
+            routes: Task type to model name (defaults to config.LLM_ROUTES)
+        """
+        self.default_model = default_model or config.LLM_MODEL
+        self.routes = dict(config.LLM_ROUTES if routes is None else routes)
+        self.missing_models = set()
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    def model_for(self, task: str) -> str:
+        """
+        Get the model that should handle a task.
+
+        Args:
+            task: Task type (generation profile name)
+
+        Returns:
+            Model name
+        """
+        model = self.routes.get(task, self.default_model)
+        if model in self.missing_models:
+            return self.default_model
+        return model
+
+    def mark_missing(self, model: str) -> bool:
+        """
+        Record that the server does not have a routed model.
+
+        Args:
+            model: Model name that was not found
+
+        Returns:
+            True if the model's tasks can fall back to the default model
+        """
+        if model == self.default_model:
+            return False
+        if model not in self.missing_models:
+            print(f"Model {model} not found; routing its tasks to {self.default_model}")
+            self.missing_models.add(model)
+        return True
+
+    def check_missing(self, model: str) -> None:
+        """
+        Handle a "model not found" response from the server.
+
+        Args:
+            model: Model the request was sent to
+
+        Raises:
+            ModelNotFoundError: If the request should be repeated on the default model
+        """
+        if self.mark_missing(model):
+            raise ModelNotFoundError(model)
+
+    def models(self) -> List[str]:
+        """
+        Get every model the router may send requests to.
+
+        Returns:
+            Default model first, then the routed models not marked missing
+        """
+        routed = [model for model in self.routes.values()
+                  if model != self.default_model and model not in self.missing_models]
+        return [self.default_model] + sorted(set(routed))
+
+    def record(self, task: str, model: str, seconds: float, ok: bool = True,
+               first_token_seconds: Optional[float] = None) -> None:
+        """
+        Record the latency of one call.
+
+        Args:
+            task: Task type
+            model: Model that handled the call
+            seconds: Total call duration
+            ok: Whether the call succeeded
+            first_token_seconds: Time to the first fragment, for streaming calls
+        """
+        with self._lock:
+            entry = self._metrics.setdefault(task, {
+                "model": model, "calls": 0, "errors": 0,
+                "total_seconds": 0.0, "max_seconds": 0.0,
+                "streams": 0, "total_first_token_seconds": 0.0
+            })
+            entry["model"] = model
+            entry["calls"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if first_token_seconds is not None:
+                entry["streams"] += 1
+                entry["total_first_token_seconds"] += first_token_seconds
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get latency metrics per route.
+
+        Returns:
+            Dictionary mapping each task type to its model, call and error
+            counts, and mean/max latency (plus mean time to first token for
+            streamed calls)
+        """
+        with self._lock:
+            stats = {}
+            for task, entry in self._metrics.items():
+                stats[task] = {
+                    "model": entry["model"],
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "mean_seconds": entry["total_seconds"] / entry["calls"],
+                    "max_seconds": entry["max_seconds"],
+                    "mean_first_token_seconds": (entry["total_first_token_seconds"] / entry["streams"]
+                                                 if entry["streams"] else None)
+                }
+            return stats
+
+    @staticmethod
+    def format_stats(stats: Dict[str, Dict[str, Any]]) -> str:
+        """
+        Format route metrics for display.
+
+        Args:
+            stats: Metrics from get_stats
+
+        Returns:
+            Human-readable table, one line per route
+        """
+        lines = []
+        for task, entry in sorted(stats.items()):
+            line = (f"{task:<16} {entry['model']:<16} {entry['calls']:>4} calls "
+                    f"{entry['errors']:>3} errors  mean {entry['mean_seconds']:.2f}s  max {entry['max_seconds']:.2f}s")
+            if entry["mean_first_token_seconds"] is not None:
+                line += f"  first token {entry['mean_first_token_seconds']:.2f}s"
+            lines.append(line)
+        return "\n".join(lines)
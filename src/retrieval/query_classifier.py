@@ -0,0 +1,139 @@
+"""
+Embedding-based classification of query intent and CISSP domains.
+"""
+import os
+from typing import Dict, List, Any, Optional
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+from src.retrieval.domains import CISSP_DOMAINS
+
+
+# Example questions per intent; each intent's centroid is the mean of their embeddings
+QUERY_INTENTS: Dict[str, List[str]] = {
+    "definition": [
+        "What is the CIA triad?",
+        "Define non-repudiation.",
+        "What does RPO mean?",
+        "Explain what a security baseline is.",
+        "What is a digital signature?"
+    ],
+    "comparison": [
+        "What is the difference between MAC and DAC?",
+        "Compare symmetric and asymmetric encryption.",
+        "Bell-LaPadula vs Biba: how do they differ?",
+        "How is a hot site different from a warm site?",
+        "Which is better for integrity, hashing or encryption?"
+    ],
+    "scenario": [
+        "A company discovers a data breach. What should the security manager do first?",
+        "An employee leaves the organization. Which action is most important?",
+        "Which control should an organization implement to stop this attack?",
+        "A server was compromised overnight. What is the best next step?",
+        "What should the CISO recommend to senior management in this situation?"
+    ],
+    "process": [
+        "What are the steps of the incident response process?",
+        "How do you perform a business impact analysis?",
+        "What are the phases of the software development lifecycle?",
+        "In what order should a disaster recovery plan be tested?",
+        "How is a risk assessment carried out?"
+    ],
+    "exam_strategy": [
+        "How should I study for the CISSP exam?",
+        "Any tips for answering CISSP questions?",
+        "How many questions are on the CISSP exam?",
+        "Which domain should I focus on before my exam?",
+        "How do I think like a manager on the exam?"
+    ]
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class QueryClassifier:
+    """
+    Classifies a query's intent and CISSP domains from its embedding.
+
+    Each intent and each domain is represented by a precomputed centroid:
+    the mean embedding of the intent's example questions, and the domain's
+    description from CISSP_DOMAINS. All centroids are stacked in one
+    normalized matrix, so classifying a query the retriever has already
+    embedded is a single matrix-vector product with no model or LLM call.
+    """
+
+    def __init__(self, model=None, intents: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize the classifier and compute its centroids.
+
+        Args:
+            model: Loaded SentenceTransformer matching the query embeddings
+                (defaults to loading config.EMBEDDING_MODEL)
+            intents: Intent name to example questions (defaults to QUERY_INTENTS)
+        """
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(config.EMBEDDING_MODEL)
+        self.model = model
+        intents = intents or QUERY_INTENTS
+        self.intents = list(intents)
+        self.domains = list(CISSP_DOMAINS)
+
+        # Encode every example and description in one batch
+        examples = [example for name in self.intents for example in intents[name]]
+        vectors = _normalize(np.asarray(model.encode(examples + list(CISSP_DOMAINS.values())),
+                                        dtype=np.float32))
+
+        centroids = []
+        start = 0
+        for name in self.intents:
+            count = len(intents[name])
+            centroids.append(vectors[start:start + count].mean(axis=0))
+            start += count
+        centroids.extend(vectors[start:])
+        self.centroids = _normalize(np.asarray(centroids, dtype=np.float32))
+
+    def encode(self, query: str) -> List[float]:
+        """
+        Embed a query, for callers that do not already have its embedding.
+        """
+        return self.model.encode(query).tolist()
+
+    def classify(self, query_embedding: List[float], margin: float = None,
+                 max_topics: int = None, min_score: float = None) -> Dict[str, Any]:
+        """
+        Classify a query by its embedding.
+
+        Args:
+            query_embedding: Embedding of the query
+            margin: Domains scoring within this of the best one are also returned
+            max_topics: Maximum number of domains returned
+            min_score: Minimum similarity for a domain to be returned
+
+        Returns:
+            Dictionary with the "intent", the matching "topics" (best first,
+            or ["General Security Concepts"] if no domain is close enough)
+            and the similarity of every intent and domain in "scores"
+        """
+        margin = config.QUERY_TOPIC_MARGIN if margin is None else margin
+        max_topics = max_topics or config.QUERY_MAX_TOPICS
+        min_score = config.QUERY_TOPIC_MIN_SCORE if min_score is None else min_score
+
+        scores = self.centroids @ _normalize(np.asarray(query_embedding, dtype=np.float32))
+        intent_scores = scores[:len(self.intents)]
+        domain_scores = scores[len(self.intents):]
+
+        ranked = np.argsort(-domain_scores)[:max_topics]
+        best = domain_scores[ranked[0]]
+        topics = [self.domains[i] for i in ranked
+                  if domain_scores[i] >= min_score and best - domain_scores[i] <= margin]
+
+        return {
+            "intent": self.intents[int(np.argmax(intent_scores))],
+            "topics": topics or ["General Security Concepts"],
+            "scores": dict(zip(self.intents + self.domains, scores.tolist()))
+        }
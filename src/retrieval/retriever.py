@@ -2,16 +2,17 @@
 Retrieval module for finding relevant context from the vector database.
 """
 import os
-from typing import Dict, List, Any, Optional
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-from sklearn.metrics.pairwise import cosine_similarity
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import config
+from src.retrieval.keyword_index import KeywordIndex
+from src.retrieval.vector_store import get_vector_store
+from src.retrieval.context_packer import ContextPacker
 
 
 class Retriever:
@@ -19,7 +20,8 @@ class Retriever:
     Handles retrieval of relevant context from the vector database.
     """
     
-    def __init__(self, model_name: str = None, db_dir: str = None, top_k: int = None):
+    def __init__(self, model_name: str = None, db_dir: str = None, top_k: int = None,
+                 mode: str = None):
         """
         Initialize the retriever.
         
@@ -27,27 +29,31 @@ class Retriever:
             model_name: Name of the embedding model to use
             db_dir: Directory containing the vector database
             top_k: Number of results to retrieve
+            mode: Retrieval mode, "vector" or "hybrid"
         """
         self.model_name = model_name or config.EMBEDDING_MODEL
         self.db_dir = db_dir or config.DB_DIR
         self.top_k = top_k or config.TOP_K
+        self.mode = mode or config.RETRIEVAL_MODE
         
         # Initialize the embedding model
         self.model = SentenceTransformer(self.model_name)
         
-        # Initialize ChromaDB
-        self.client = chromadb.PersistentClient(
-            path=str(self.db_dir),
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        # Get the collection
+        # Open the configured vector store
         try:
-            self.collection = self.client.get_collection("cissp_knowledge")
+            self.collection = get_vector_store(self.db_dir)
             print(f"Connected to collection with {self.collection.count()} documents")
         except ValueError:
             print("Collection not found. Please run the ingestion process first.")
             self.collection = None
+        
+        # Cached distinct metadata values for search scoping
+        self._filter_options = None
+        
+        # Load the BM25 keyword index used by hybrid retrieval
+        self.keyword_index = KeywordIndex.load(Path(self.db_dir) / config.KEYWORD_INDEX_FILE)
+        if self.mode == "hybrid" and self.keyword_index is None:
+            print("Keyword index not found. Hybrid retrieval will fall back to vector search.")
     
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -61,40 +67,334 @@ class Retriever:
         """
         return self.model.encode(text).tolist()
     
-    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several texts in one batched forward pass.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            List of embedding vectors
+        """
+        return self.model.encode(texts).tolist()
+    
+    def retrieve(self, query: str, top_k: Optional[int] = None,
+                 mode: Optional[str] = None,
+                 filters: Optional[Dict[str, Any]] = None,
+                 query_embedding: Optional[List[float]] = None,
+                 diversify: Optional[bool] = None, fetch_k: Optional[int] = None,
+                 mmr_lambda: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query.
         
         Args:
             query: Query text
             top_k: Number of results to retrieve (overrides instance setting)
+            mode: Retrieval mode, "vector" or "hybrid" (overrides instance setting)
+            filters: Optional search scope (see `build_where`)
+            query_embedding: Precomputed embedding of the query, if already available
+            diversify: Select results with maximal marginal relevance (defaults to config.MMR_ENABLED)
+            fetch_k: Number of candidates fetched before MMR selection
+            mmr_lambda: MMR trade-off between relevance (1.0) and diversity (0.0)
             
         Returns:
             List of dictionaries containing retrieved documents and metadata
         """
+        return self.retrieve_many(
+            [query], top_k=top_k, mode=mode, filters=filters,
+            query_embeddings=[query_embedding] if query_embedding is not None else None,
+            diversify=diversify, fetch_k=fetch_k, mmr_lambda=mmr_lambda
+        )[0]
+    
+    def retrieve_many(self, queries: List[str], top_k: Optional[int] = None,
+                      where: Optional[Dict[str, Any]] = None,
+                      mode: Optional[str] = None,
+                      filters: Optional[Dict[str, Any]] = None,
+                      query_embeddings: Optional[List[List[float]]] = None,
+                      diversify: Optional[bool] = None, fetch_k: Optional[int] = None,
+                      mmr_lambda: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for several queries in one round trip.
+        
+        All queries are encoded in a single batched forward pass and sent to
+        the collection as one multi-query request.
+        
+        Args:
+            queries: List of query texts
+            top_k: Number of results to retrieve per query (overrides instance setting)
+            where: Optional Chroma metadata filter applied to every query
+            mode: Retrieval mode, "vector" or "hybrid" (overrides instance setting)
+            filters: Optional search scope applied to every query (see `build_where`)
+            query_embeddings: Precomputed query embeddings, if already available
+            diversify: Select results with maximal marginal relevance (defaults to config.MMR_ENABLED)
+            fetch_k: Number of candidates fetched before MMR selection (defaults to config.MMR_FETCH_K)
+            mmr_lambda: MMR trade-off between relevance (1.0) and diversity (0.0)
+                (defaults to config.MMR_LAMBDA)
+            
+        Returns:
+            One list of retrieved documents per query, in the same order as `queries`
+        """
+        if not queries:
+            return []
+        
         if not self.collection:
             print("Collection not available. Please run the ingestion process first.")
-            return []
+            return [[] for _ in queries]
         
         k = top_k or self.top_k
+        diversify = config.MMR_ENABLED if diversify is None else diversify
+        
+        # Over-fetch candidates when diversifying; MMR picks the final k from them
+        candidate_k = max(k, fetch_k or config.MMR_FETCH_K) if diversify else k
         
-        # Generate embedding for the query
-        query_embedding = self.generate_embedding(query)
+        # Filters are pushed down into the search so only matching chunks are scored
+        scope = self.build_where(filters)
+        if scope and where:
+            where = {"$and": [scope, where]}
+        else:
+            where = scope or where
+        
+        # Generate embeddings for all queries in one batch
+        if query_embeddings is None:
+            query_embeddings = self.generate_embeddings(queries)
         
         # Query the collection
         results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k,
-            include=["documents", "metadatas", "distances"]
+            query_embeddings=query_embeddings,
+            n_results=candidate_k,
+            where=where,
+            include=["documents", "metadatas", "distances", "embeddings"]
         )
         
-        # Format the results
+        candidates = [self._format_results(results, i) for i in range(len(queries))]
+        
+        if (mode or self.mode) == "hybrid" and self.keyword_index is not None:
+            candidates = self._fuse_keyword_results(queries, query_embeddings, candidates, candidate_k, where)
+        
+        if not diversify:
+            return candidates
+        
+        lam = config.MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+        selected_results = []
+        for query_embedding, query_candidates in zip(query_embeddings, candidates):
+            if len(query_candidates) <= k:
+                selected_results.append(query_candidates)
+                continue
+            embeddings = self._stack_embeddings(query_candidates)
+            selected = self.mmr_select(np.asarray(query_embedding, dtype=np.float32), embeddings, k, lam)
+            selected_results.append([query_candidates[i] for i in selected])
+        
+        return selected_results
+    
+    @staticmethod
+    def mmr_select(query_embedding: np.ndarray, embeddings: np.ndarray, k: int,
+                   mmr_lambda: float = 0.5) -> List[int]:
+        """
+        Select k diverse, relevant candidates with maximal marginal relevance.
+        
+        Relevance and candidate-to-candidate similarities are computed once as
+        matrix products; each selection step is then a vectorized update.
+        
+        Args:
+            query_embedding: Query vector
+            embeddings: Candidate vectors, shape (n, dim)
+            k: Number of candidates to select
+            mmr_lambda: Trade-off between relevance (1.0) and diversity (0.0)
+            
+        Returns:
+            Indices of the selected candidates, in selection order
+        """
+        n = len(embeddings)
+        if n == 0:
+            return []
+        
+        normalized = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        query = query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12)
+        relevance = normalized @ query
+        similarity = normalized @ normalized.T
+        
+        selected = [int(np.argmax(relevance))]
+        max_similarity = similarity[selected[0]].copy()
+        available = np.ones(n, dtype=bool)
+        available[selected[0]] = False
+        
+        for _ in range(min(k, n) - 1):
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_similarity, similarity[best], out=max_similarity)
+        
+        return selected
+    
+    def _fuse_keyword_results(self, queries: List[str], query_embeddings: List[List[float]],
+                              vector_results: List[List[Dict[str, Any]]], k: int,
+                              where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Fuse BM25 and vector rankings with reciprocal rank fusion.
+        
+        Chunks that only the keyword index found are fetched from the
+        collection in a single call, so every fused result carries the same
+        fields as a vector result.
+        
+        Args:
+            queries: List of query texts
+            query_embeddings: Embeddings of the queries
+            vector_results: Vector search results per query
+            k: Number of results to return per query
+            where: Optional Chroma metadata filter applied to keyword-only hits
+            
+        Returns:
+            Fused results per query, best first, each with an "rrf_score"
+        """
+        # Restrict BM25 scoring to chunks matching the filter
+        allowed = None
+        if where:
+            allowed_ids = self.collection.get(where=where, include=[])["ids"]
+            allowed = self.keyword_index.doc_mask(allowed_ids)
+        
+        keyword_hits = [self.keyword_index.search(query, top_k=k, allowed=allowed) for query in queries]
+        
+        # Fetch every keyword-only hit across the batch at once
+        known_ids = {result["id"] for results in vector_results for result in results}
+        missing_ids = list({doc_id for hits in keyword_hits for doc_id, _ in hits} - known_ids)
+        fetched = {}
+        if missing_ids:
+            data = self.collection.get(ids=missing_ids, where=where,
+                                       include=["documents", "metadatas", "embeddings"])
+            for i, doc_id in enumerate(data["ids"]):
+                fetched[doc_id] = {
+                    "id": doc_id,
+                    "text": data["documents"][i],
+                    "metadata": data["metadatas"][i],
+                    "embedding": np.asarray(data["embeddings"][i], dtype=np.float32)
+                }
+        
+        fused_results = []
+        for query_embedding, vector_hits, hits in zip(query_embeddings, vector_results, keyword_hits):
+            candidates = {result["id"]: result for result in vector_hits}
+            scores = {}
+            for rank, result in enumerate(vector_hits):
+                scores[result["id"]] = 1.0 / (config.RRF_K + rank + 1)
+            
+            for keyword_rank, (doc_id, _) in enumerate(hits):
+                if doc_id not in candidates:
+                    if doc_id not in fetched:
+                        continue  # Indexed but no longer in the collection
+                    # Score keyword-only hits with the cosine distance the collection would report
+                    candidate = dict(fetched[doc_id])
+                    query_vector = np.asarray(query_embedding, dtype=np.float32)
+                    denominator = np.linalg.norm(query_vector) * np.linalg.norm(candidate["embedding"])
+                    candidate["distance"] = float(1.0 - query_vector @ candidate["embedding"] / max(denominator, 1e-12))
+                    candidates[doc_id] = candidate
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (config.RRF_K + keyword_rank + 1)
+            
+            ranked_ids = sorted(scores, key=scores.get, reverse=True)[:k]
+            fused_results.append([
+                dict(candidates[doc_id], rrf_score=scores[doc_id]) for doc_id in ranked_ids
+            ])
+        
+        return fused_results
+    
+    @staticmethod
+    def build_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Translate a search scope into a Chroma `where` clause.
+        
+        Supported keys (all optional):
+            title: Book title, or list of titles
+            source_type: "pdf" or "epub", or a list of them
+            domain: CISSP domain name, or list of names
+            page_range: (first_page, last_page) tuple; either end may be None
+        
+        Args:
+            filters: Search scope
+            
+        Returns:
+            Chroma `where` clause, or None if the scope is empty
+        """
+        if not filters:
+            return None
+        
+        clauses = []
+        for key, field in [("title", "title"), ("source_type", "source_type"), ("domain", "cissp_domain")]:
+            value = filters.get(key)
+            if not value:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append({field: {"$in": list(value)}})
+            else:
+                clauses.append({field: {"$eq": value}})
+        
+        page_range = filters.get("page_range")
+        if page_range:
+            first_page, last_page = page_range
+            if first_page is not None:
+                clauses.append({"page_number": {"$gte": int(first_page)}})
+            if last_page is not None:
+                clauses.append({"page_number": {"$lte": int(last_page)}})
+        
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+    
+    def index_version(self) -> str:
+        """
+        Get a token identifying the current state of the vector and keyword indexes.
+        
+        Returns:
+            Version string that changes whenever either index is rebuilt
+        """
+        if not self.collection:
+            return "empty"
+        
+        keyword_path = Path(self.db_dir) / config.KEYWORD_INDEX_FILE
+        keyword_version = keyword_path.stat().st_mtime_ns if keyword_path.exists() else 0
+        return f"{self.collection.version()}:{keyword_version}"
+    
+    def get_filter_options(self) -> Dict[str, List[str]]:
+        """
+        List the values available for scoping searches.
+        
+        Returns:
+            Dictionary with sorted "titles", "source_types" and "domains"
+        """
+        if not self.collection:
+            return {"titles": [], "source_types": [], "domains": []}
+        
+        if self._filter_options is None:
+            metadatas = self.collection.get(include=["metadatas"])["metadatas"]
+            self._filter_options = {
+                "titles": sorted({m["title"] for m in metadatas if m.get("title")}),
+                "source_types": sorted({m["source_type"] for m in metadatas if m.get("source_type")}),
+                "domains": sorted({m["cissp_domain"] for m in metadatas if m.get("cissp_domain")})
+            }
+        return self._filter_options
+    
+    @staticmethod
+    def _format_results(results: Dict[str, Any], query_index: int) -> List[Dict[str, Any]]:
+        """
+        Convert one query's slice of a Chroma query response into result dictionaries.
+        
+        Args:
+            results: Raw response from `collection.query`
+            query_index: Index of the query within the batch
+            
+        Returns:
+            List of dictionaries containing retrieved documents and metadata
+        """
         formatted_results = []
-        for i in range(len(results["documents"][0])):
+        for i in range(len(results["documents"][query_index])):
             formatted_results.append({
-                "text": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "distance": results["distances"][0][i]
+                "id": results["ids"][query_index][i],
+                "text": results["documents"][query_index][i],
+                "metadata": results["metadatas"][query_index][i],
+                "distance": results["distances"][query_index][i],
+                "embedding": np.asarray(results["embeddings"][query_index][i], dtype=np.float32)
             })
         
         return formatted_results
@@ -115,37 +415,62 @@ class Retriever:
         
         threshold = threshold or config.SIMILARITY_THRESHOLD
         
-        # Extract texts and generate embeddings
-        texts = [result["text"] for result in results]
-        embeddings = [self.generate_embedding(text) for text in texts]
+        # Reuse the vectors stored in the collection; only encode results that lack one
+        embeddings = self._stack_embeddings(results)
+        
+        # Compute all pairwise cosine similarities in one matrix product
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized = embeddings / np.maximum(norms, 1e-12)
+        similarities = normalized @ normalized.T
         
-        # Compute pairwise similarities
-        similarities = cosine_similarity(embeddings)
+        # Find potential contradictions (low similarity) in the upper triangle
+        rows, cols = np.triu_indices(len(results), k=1)
+        pair_similarities = similarities[rows, cols]
+        mask = pair_similarities < threshold
         
-        # Find potential contradictions (low similarity)
         contradictions = []
-        for i in range(len(results)):
-            for j in range(i + 1, len(results)):
-                similarity = similarities[i][j]
-                
-                if similarity < threshold:
-                    contradictions.append({
-                        "doc1": {
-                            "text": results[i]["text"],
-                            "metadata": results[i]["metadata"]
-                        },
-                        "doc2": {
-                            "text": results[j]["text"],
-                            "metadata": results[j]["metadata"]
-                        },
-                        "similarity": float(similarity)
-                    })
+        for i, j, similarity in zip(rows[mask], cols[mask], pair_similarities[mask]):
+            contradictions.append({
+                "doc1": {
+                    "text": results[i]["text"],
+                    "metadata": results[i]["metadata"]
+                },
+                "doc2": {
+                    "text": results[j]["text"],
+                    "metadata": results[j]["metadata"]
+                },
+                "similarity": float(similarity)
+            })
         
         return {
             "has_contradictions": len(contradictions) > 0,
             "contradictions": contradictions
         }
     
+    def _stack_embeddings(self, results: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Build an embedding matrix for retrieved results.
+        
+        Results returned by `retrieve` already carry their stored vectors. Any
+        result without one is encoded in a single batched call.
+        
+        Args:
+            results: List of retrieved documents
+            
+        Returns:
+            Array of shape (len(results), dim)
+        """
+        missing = [i for i, result in enumerate(results) if result.get("embedding") is None]
+        encoded = {}
+        if missing:
+            vectors = self.model.encode([results[i]["text"] for i in missing])
+            encoded = dict(zip(missing, vectors))
+        
+        return np.vstack([
+            np.asarray(encoded[i] if i in encoded else result["embedding"], dtype=np.float32)
+            for i, result in enumerate(results)
+        ])
+    
     def format_context(self, results: List[Dict[str, Any]], include_metadata: bool = True) -> str:
         """
         Format retrieved results into a context string for the LLM.
@@ -174,6 +499,34 @@ class Retriever:
                 context_parts.append(f"[{i+1}] {text}\n")
         
         return "\n".join(context_parts)
+    
+    def pack_context(self, results: List[Dict[str, Any]], token_budget: Optional[int] = None,
+                     include_metadata: bool = True, query_embedding: Optional[List[float]] = None,
+                     compress: Optional[bool] = None,
+                     compression_ratio: Optional[float] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Pack retrieved results into a deduplicated, token-budgeted context string.
+        
+        With a query embedding, the packed sentences are compressed to the
+        ones most relevant to the query, scored in one batch with the
+        retriever's embedding model.
+        
+        Args:
+            results: List of retrieved documents, most relevant first
+            token_budget: Maximum context tokens (defaults to config.CONTEXT_TOKEN_BUDGET)
+            include_metadata: Whether to include metadata in the context
+            query_embedding: Embedding of the query, required for compression
+            compress: Compress the context (defaults to config.CONTEXT_COMPRESSION_ENABLED)
+            compression_ratio: Fraction of packed tokens kept (defaults to config.CONTEXT_COMPRESSION_RATIO)
+            
+        Returns:
+            Tuple of (context string, source metadata for each citation number)
+        """
+        compress = config.CONTEXT_COMPRESSION_ENABLED if compress is None else compress
+        packer = ContextPacker(token_budget, compression_ratio)
+        if not compress or query_embedding is None:
+            return packer.pack(results, include_metadata)
+        return packer.pack(results, include_metadata, query_embedding, self.model.encode)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+"""
+import threading
+from typing import Dict, List, Any, Callable, Iterator, Optional
+
+
+class _Flight:
+    """
+    A call in progress and its eventual result.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _StreamFlight:
+    """
+    A streaming call in progress, with every fragment produced so far.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.fragments: List[str] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one execution.
+
+    The first caller for a key runs the work; callers that arrive while it
+    is in flight wait for it and receive the same result (or exception).
+    Streaming callers receive every fragment already produced and then
+    follow the live stream. Once a call finishes its key is released, so
+    later calls run again.
+    """
+
+    def __init__(self):
+        """
+        Initialize the single-flight group.
+        """
+        self._flights: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def _join(self, key: tuple, factory: Callable[[], Any]):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = factory()
+            self.executions += 1
+            return flight, True
+
+    def _release(self, key: tuple) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run `fn` once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call
+            fn: Work to run
+
+        Returns:
+            Result of `fn`
+        """
+        flight, leader = self._join(("call", key), _Flight)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._release(("call", key))
+            flight.done.set()
+
+    def stream(self, key: str, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        Stream the fragments of `fn` to all concurrent callers with the same key.
+
+        If the first caller stops reading early, the stream ends there for
+        everyone attached to it.
+
+        Args:
+            key: Identity of the call
+            fn: Returns the iterator of fragments to share
+
+        Yields:
+            Text fragments, in order
+        """
+        flight, leader = self._join(("stream", key), _StreamFlight)
+        if leader:
+            yield from self._lead(key, flight, fn)
+        else:
+            yield from self._follow(flight)
+
+    def _lead(self, key: str, flight: _StreamFlight, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        try:
+            for fragment in fn():
+                with flight.condition:
+                    flight.fragments.append(fragment)
+                    flight.condition.notify_all()
+                yield fragment
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._release(("stream", key))
+            with flight.condition:
+                flight.finished = True
+                flight.condition.notify_all()
+
+    @staticmethod
+    def _follow(flight: _StreamFlight) -> Iterator[str]:
+        position = 0
+        while True:
+            with flight.condition:
+                while position >= len(flight.fragments) and not flight.finished:
+                    flight.condition.wait()
+                fragments = flight.fragments[position:]
+                position += len(fragments)
+                finished = flight.finished and position >= len(flight.fragments)
+            yield from fragments
+            if finished:
+                if flight.error is not None and not isinstance(flight.error, GeneratorExit):
+                    raise flight.error
+                return
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing statistics.
+
+        Returns:
+            Dictionary with executions, coalesced calls and calls in flight
+        """
+        with self._lock:
+            in_flight = len(self._flights)
+        return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": in_flight}
@@ -0,0 +1,110 @@
+"""
+Typed output schemas for structured (JSON) LLM generation.
+"""
+from typing import List, Literal, Optional, Type, TypeVar
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+
+OPTION_LETTERS = ["A", "B", "C", "D"]
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+
+def label_options(options: List[str]) -> List[str]:
+    """
+    Make sure multiple-choice options start with their letter, e.g. "A) ...".
+
+    Args:
+        options: Option texts, in A-D order
+
+    Returns:
+        Labelled options
+    """
+    labelled = []
+    for letter, option in zip(OPTION_LETTERS, options):
+        option = option.strip()
+        if not option.upper().startswith((f"{letter})", f"{letter}.", f"{letter}:")):
+            option = f"{letter}) {option}"
+        labelled.append(option)
+    return labelled
+
+
+class FollowUpQuestions(BaseModel):
+    """
+    Follow-up questions for a tutor answer.
+    """
+    questions: List[str] = Field(min_length=1, max_length=3)
+
+
+class MultipleChoiceQuestion(BaseModel):
+    """
+    A CISSP multiple-choice question with four options and one correct answer.
+    """
+    question_text: str = Field(min_length=10)
+    options: List[str] = Field(min_length=4, max_length=4)
+    correct_answer: Literal["A", "B", "C", "D"]
+    explanation: str = Field(min_length=20)
+
+    @field_validator("options")
+    @classmethod
+    def _options_not_empty(cls, options: List[str]) -> List[str]:
+        if any(len(option.strip()) < 2 for option in options):
+            raise ValueError("every option needs text")
+        return label_options(options)
+
+
+class ReviewQuestion(MultipleChoiceQuestion):
+    """
+    A review question, with the study references that support its answer.
+    """
+    references: List[str] = Field(default_factory=list, max_length=3)
+
+
+def parse_structured(text: str, schema: Type[SchemaT]) -> Optional[SchemaT]:
+    """
+    Validate an LLM response against a schema.
+
+    Args:
+        text: Raw LLM response
+        schema: Pydantic model the response should match
+
+    Returns:
+        Parsed model, or None if the response does not match
+    """
+    try:
+        return schema.model_validate_json(text)
+    except ValidationError:
+        return None
+
+
+def build_repair_prompt(text: str, schema: Type[BaseModel]) -> str:
+    """
+    Build a prompt asking the LLM to fix a response that failed validation.
+
+    Args:
+        text: Invalid LLM response
+        schema: Pydantic model the response should match
+
+    Returns:
+        Repair prompt listing the validation errors
+    """
+    try:
+        schema.model_validate_json(text)
+        errors = "none"
+    except ValidationError as e:
+        errors = "\n".join(
+            f"- {'.'.join(str(part) for part in error['loc']) or 'response'}: {error['msg']}"
+            for error in e.errors()
+        )
+
+    return f"""
+The following JSON does not match the required schema.
+
+JSON:
+{text}
+
+Problems:
+{errors}
+
+Return the corrected JSON object only, keeping the original content wherever it is valid.
+"""
@@ -0,0 +1,555 @@
+"""
+Vector store module providing interchangeable storage backends for chunk embeddings.
+"""
+import os
+import json
+import time
+import shutil
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore(ABC):
+    """
+    Base interface for vector storage backends.
+
+    Responses follow Chroma's result layout (parallel "ids", "documents",
+    "metadatas", "distances" and "embeddings" lists) so callers can switch
+    backends without changing how results are read.
+    """
+
+    name = config.COLLECTION_NAME
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        Get the number of stored chunks.
+
+        Returns:
+            Number of chunks
+        """
+
+    @abstractmethod
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Add chunks to the store.
+
+        Args:
+            ids: Chunk IDs
+            embeddings: Embedding vectors
+            documents: Chunk texts
+            metadatas: Chunk metadata
+        """
+
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], n_results: int,
+              where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """
+        Find the nearest chunks for one or more query embeddings.
+
+        Args:
+            query_embeddings: Query vectors
+            n_results: Number of results per query
+            where: Optional metadata filter (Chroma syntax)
+            include: Fields to return
+
+        Returns:
+            Dictionary of per-query result lists
+        """
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """
+        Fetch chunks by ID and/or metadata filter.
+
+        Args:
+            ids: Chunk IDs to fetch (all chunks if None)
+            where: Optional metadata filter (Chroma syntax)
+            include: Fields to return
+
+        Returns:
+            Dictionary of result lists
+        """
+
+    def persist(self) -> None:
+        """
+        Flush pending writes to disk. Backends that write through may ignore this.
+        """
+
+    @abstractmethod
+    def version(self) -> str:
+        """
+        Get a token that changes whenever the stored chunks change.
+
+        Returns:
+            Version string
+        """
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Vector store backed by a persistent ChromaDB collection (HNSW index).
+    """
+
+    def __init__(self, db_dir: str = None, create: bool = False):
+        """
+        Initialize the Chroma store.
+
+        Args:
+            db_dir: Directory containing the vector database
+            create: Create the collection if it does not exist
+
+        Raises:
+            ValueError: If the collection does not exist and `create` is False
+        """
+        import chromadb
+        from chromadb.config import Settings
+
+        self.db_dir = db_dir or config.DB_DIR
+        self.client = chromadb.PersistentClient(
+            path=str(self.db_dir),
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+        if create:
+            self.collection = self.client.get_or_create_collection(
+                name=self.name,
+                metadata=hnsw_metadata()
+            )
+        else:
+            self.collection = self.client.get_collection(self.name)
+
+        self._apply_search_ef()
+
+    def _apply_search_ef(self) -> None:
+        """
+        Update the query-time ef of an existing collection to match the config.
+
+        M and ef_construction are fixed when the collection is built; only
+        ef_search can change afterwards, through Chroma's collection
+        configuration API. Nothing is written when the value already
+        matches, since every write to chroma.sqlite3 changes `version()`.
+        """
+        try:
+            applied = set_search_ef(self.collection, config.HNSW_EF_SEARCH)
+        except Exception as e:
+            logger.warning(f"Could not set ef_search={config.HNSW_EF_SEARCH} on collection {self.name}: {e}")
+            return
+
+        current = (self.collection.metadata or {}).get("hnsw:search_ef")
+        if not applied and current is not None:
+            logger.warning(f"Collection {self.name} was built with ef_search={current}; this Chroma "
+                           f"version cannot change it to {config.HNSW_EF_SEARCH} without rebuilding")
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def version(self) -> str:
+        sqlite_path = Path(self.db_dir) / "chroma.sqlite3"
+        modified = sqlite_path.stat().st_mtime_ns if sqlite_path.exists() else 0
+        return f"chroma:{self.count()}:{modified}"
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: List[Dict[str, Any]]) -> None:
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int,
+              where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        query_args = {
+            "query_embeddings": query_embeddings,
+            "n_results": n_results,
+            "include": include if include is not None else ["documents", "metadatas", "distances"]
+        }
+        if where:
+            query_args["where"] = where
+        return self.collection.query(**query_args)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        get_args = {"include": include if include is not None else ["documents", "metadatas"]}
+        if ids is not None:
+            get_args["ids"] = ids
+        if where:
+            get_args["where"] = where
+        return self.collection.get(**get_args)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search vector store over a memory-mapped embedding matrix.
+
+    Embeddings are L2-normalized at write time and saved as a plain .npy
+    file (float16 by default, see config.NUMPY_STORE_DTYPE), so a query is
+    a BLAS dot product against the mapped matrix. The matrix is opened
+    read-only with mmap, letting several serving processes share one copy
+    through the OS page cache.
+
+    Each write goes to a new snapshot directory holding both files, and the
+    CURRENT pointer file is then swapped to it atomically, so a reader
+    always opens a matching pair of records and embeddings. Open readers
+    keep their snapshot until they reopen; the previous snapshot is kept
+    on disk for readers that are just opening it.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    RECORDS_FILE = "records.json"
+    CURRENT_FILE = "CURRENT"
+    SNAPSHOT_PREFIX = "snapshot-"
+
+    def __init__(self, db_dir: str = None, create: bool = False):
+        """
+        Initialize the NumPy store.
+
+        Args:
+            db_dir: Directory containing the vector database
+            create: Create an empty store if none exists
+
+        Raises:
+            ValueError: If the store does not exist and `create` is False
+        """
+        self.db_dir = Path(db_dir or config.DB_DIR) / config.NUMPY_STORE_SUBDIR
+        self.block_rows = config.NUMPY_STORE_BLOCK_ROWS
+        self.dtype = np.dtype(config.NUMPY_STORE_DTYPE)
+        self._pending = {}  # id -> (embedding, document, metadata)
+        self.snapshot = ""
+
+        if self._current_snapshot() is not None:
+            self._load()
+        elif create:
+            self.ids, self.documents, self.metadatas = [], [], []
+            self.embeddings = np.zeros((0, 0), dtype=self.dtype)
+        else:
+            raise ValueError(f"No NumPy vector store found in {self.db_dir}")
+
+    def _current_snapshot(self) -> Optional[str]:
+        """
+        Get the name of the current snapshot directory.
+
+        Returns:
+            Snapshot name, "" for a store written before snapshots were used,
+            or None if there is no store
+        """
+        try:
+            return (self.db_dir / self.CURRENT_FILE).read_text().strip()
+        except FileNotFoundError:
+            return "" if (self.db_dir / self.EMBEDDINGS_FILE).exists() else None
+
+    def _load(self) -> None:
+        """
+        Memory-map the current embedding matrix and load its chunk records.
+
+        Raises:
+            ValueError: If the records and embeddings do not match
+        """
+        for attempt in range(2):
+            snapshot = self._current_snapshot()
+            directory = self.db_dir / snapshot
+            try:
+                embeddings = np.load(directory / self.EMBEDDINGS_FILE, mmap_mode="r")
+                with open(directory / self.RECORDS_FILE, "r") as f:
+                    records = json.load(f)
+                break
+            except FileNotFoundError:
+                # The snapshot was replaced and removed while opening it; read the pointer again
+                if attempt:
+                    raise
+
+        rows = len(records["ids"])
+        if not (len(records["documents"]) == len(records["metadatas"]) == rows == embeddings.shape[0]) \
+                or (rows and embeddings.ndim != 2):
+            raise ValueError(f"NumPy vector store in {directory} is inconsistent: {rows} records, "
+                             f"embeddings of shape {embeddings.shape}")
+
+        self.snapshot = snapshot
+        self.embeddings = embeddings
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = records["metadatas"]
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def version(self) -> str:
+        return f"numpy:{self.count()}:{self.snapshot}"
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: List[Dict[str, Any]]) -> None:
+        for doc_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self._pending[doc_id] = (embedding, document, metadata)
+
+    def persist(self) -> None:
+        if not self._pending:
+            return
+
+        # Existing rows are kept unless the same ID was re-added
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in self._pending]
+        new_ids = list(self._pending)
+        new_vectors = np.asarray([self._pending[doc_id][0] for doc_id in new_ids], dtype=np.float32)
+        new_vectors /= np.maximum(np.linalg.norm(new_vectors, axis=1, keepdims=True), 1e-12)
+
+        if len(keep):
+            matrix = np.vstack([np.asarray(self.embeddings[keep], dtype=self.dtype),
+                                new_vectors.astype(self.dtype)])
+        else:
+            matrix = new_vectors.astype(self.dtype)
+
+        records = {
+            "ids": [self.ids[i] for i in keep] + new_ids,
+            "documents": [self.documents[i] for i in keep] + [self._pending[d][1] for d in new_ids],
+            "metadatas": [self.metadatas[i] for i in keep] + [self._pending[d][2] for d in new_ids]
+        }
+
+        # Write a new snapshot, then swap the pointer to it in one atomic rename
+        previous = self._current_snapshot()
+        snapshot = f"{self.SNAPSHOT_PREFIX}{time.time_ns()}"
+        directory = self.db_dir / snapshot
+        os.makedirs(directory)
+        with open(directory / self.EMBEDDINGS_FILE, "wb") as f:
+            np.save(f, matrix)
+        with open(directory / self.RECORDS_FILE, "w") as f:
+            json.dump(records, f)
+        tmp_current = self.db_dir / (self.CURRENT_FILE + ".tmp")
+        tmp_current.write_text(snapshot)
+        os.replace(tmp_current, self.db_dir / self.CURRENT_FILE)
+
+        self._remove_old_snapshots(keep={snapshot, previous})
+        self._pending = {}
+        self._load()
+
+    def _remove_old_snapshots(self, keep: set) -> None:
+        """
+        Delete snapshots other than the current and previous ones, and files from before snapshots were used.
+
+        Args:
+            keep: Snapshot names to keep
+        """
+        for path in self.db_dir.iterdir():
+            if path.name.startswith(self.SNAPSHOT_PREFIX) and path.is_dir() and path.name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+        if "" not in keep:
+            for name in (self.EMBEDDINGS_FILE, self.RECORDS_FILE):
+                (self.db_dir / name).unlink(missing_ok=True)
+
+    def _candidate_rows(self, ids: Optional[List[str]] = None,
+                        where: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        Resolve an ID list and/or metadata filter to matrix row indices.
+
+        Args:
+            ids: Chunk IDs to restrict to
+            where: Metadata filter (Chroma syntax)
+
+        Returns:
+            Array of row indices
+        """
+        if ids is not None:
+            positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            rows = [positions[doc_id] for doc_id in ids if doc_id in positions]
+        else:
+            rows = range(len(self.ids))
+
+        if where:
+            rows = [i for i in rows if matches_where(self.metadatas[i], where)]
+
+        return np.asarray(rows, dtype=np.int64)
+
+    def _build_response(self, rows: np.ndarray, include: List[str]) -> Dict[str, List[Any]]:
+        """
+        Assemble result lists for a set of rows.
+
+        Args:
+            rows: Matrix row indices
+            include: Fields to return
+
+        Returns:
+            Dictionary of result lists
+        """
+        response = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            response["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            response["metadatas"] = [self.metadatas[i] for i in rows]
+        if "embeddings" in include:
+            response["embeddings"] = [np.asarray(self.embeddings[i], dtype=np.float32) for i in rows]
+        return response
+
+    def query(self, query_embeddings: List[List[float]], n_results: int,
+              where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        # Only rows passing the filter are scored
+        rows = self._candidate_rows(where=where) if where else None
+        total = len(rows) if rows is not None else len(self.ids)
+        k = min(n_results, total)
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+
+        # Scan in blocks so any float16 -> float32 upcast stays bounded in memory;
+        # float32 blocks of the mapped matrix are used in place without copying
+        for start in range(0, total, self.block_rows):
+            block_rows = rows[start:start + self.block_rows] if rows is not None \
+                else np.arange(start, min(start + self.block_rows, total))
+            block = self.embeddings[block_rows] if rows is not None \
+                else self.embeddings[start:start + self.block_rows]
+            scores = queries @ np.asarray(block, dtype=np.float32).T
+
+            # Merge this block's candidates into the running top-k
+            merged_scores = np.hstack([best_scores, scores])
+            merged_rows = np.hstack([best_rows, np.broadcast_to(block_rows, scores.shape)])
+            if merged_scores.shape[1] > k:
+                top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                merged_scores = np.take_along_axis(merged_scores, top, axis=1)
+                merged_rows = np.take_along_axis(merged_rows, top, axis=1)
+            best_scores, best_rows = merged_scores, merged_rows
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        response = {key: [] for key in ["ids"] + include}
+        for query_rows, query_scores in zip(best_rows, best_scores):
+            single = self._build_response(query_rows, include)
+            for key, values in single.items():
+                response[key].append(values)
+            if "distances" in include:
+                response["distances"].append((1.0 - query_scores).tolist())
+        return response
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        rows = self._candidate_rows(ids=ids, where=where)
+        return self._build_response(rows, include if include is not None else ["documents", "metadatas"])
+
+
+def set_search_ef(collection, ef_search: int) -> bool:
+    """
+    Change the query-time ef of a Chroma collection, writing only if it differs.
+
+    Args:
+        collection: Chroma collection
+        ef_search: Candidate list size at query time
+
+    Returns:
+        True if the collection now searches with `ef_search`; False if this
+        Chroma release has no configuration API and the collection was built
+        with another value
+    """
+    configuration = getattr(collection, "configuration", None)
+    if not isinstance(configuration, dict):
+        # Releases without the configuration API fix all HNSW parameters at creation
+        return (collection.metadata or {}).get("hnsw:search_ef") == ef_search
+
+    if (configuration.get("hnsw") or {}).get("ef_search") != ef_search:
+        collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    return True
+
+
+def hnsw_metadata(m: int = None, ef_construction: int = None, ef_search: int = None) -> Dict[str, Any]:
+    """
+    Build Chroma collection metadata carrying the HNSW index parameters.
+
+    Args:
+        m: Graph out-degree (defaults to config.HNSW_M)
+        ef_construction: Build-time candidate list size (defaults to config.HNSW_EF_CONSTRUCTION)
+        ef_search: Query-time candidate list size (defaults to config.HNSW_EF_SEARCH)
+
+    Returns:
+        Collection metadata dictionary
+    """
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": m or config.HNSW_M,
+        "hnsw:construction_ef": ef_construction or config.HNSW_EF_CONSTRUCTION,
+        "hnsw:search_ef": ef_search or config.HNSW_EF_SEARCH
+    }
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """
+    Evaluate a Chroma-style metadata filter against one metadata dictionary.
+
+    Supports implicit equality, $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin,
+    $and and $or.
+
+    Args:
+        metadata: Chunk metadata
+        where: Metadata filter
+
+    Returns:
+        True if the metadata satisfies the filter
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    try:
+                        if operator == "$gt" and not value > operand:
+                            return False
+                        if operator == "$gte" and not value >= operand:
+                            return False
+                        if operator == "$lt" and not value < operand:
+                            return False
+                        if operator == "$lte" and not value <= operand:
+                            return False
+                    except TypeError:
+                        return False
+    return True
+
+
+def get_vector_store(db_dir: str = None, backend: str = None, create: bool = False) -> VectorStore:
+    """
+    Open the configured vector store backend.
+
+    Args:
+        db_dir: Directory containing the vector database
+        backend: "chroma" or "numpy" (defaults to config.VECTOR_STORE_BACKEND)
+        create: Create the store if it does not exist
+
+    Returns:
+        VectorStore instance
+
+    Raises:
+        ValueError: If the backend is unknown, or the store does not exist and `create` is False
+    """
+    backend = backend or config.VECTOR_STORE_BACKEND
+    if backend == "chroma":
+        return ChromaVectorStore(db_dir, create=create)
+    if backend == "numpy":
+        return NumpyVectorStore(db_dir, create=create)
+    raise ValueError(f"Unknown vector store backend: {backend}")
@@ -0,0 +1,159 @@
+"""
+Warm-up manager that keeps the LLM and embedding model loaded.
+"""
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+class WarmupManager:
+    """
+    Preloads the Ollama models and the embedding model, and keeps them warm.
+
+    `warm_up` loads the LLMs with a no-op request (using the configured
+    keep-alive) and runs one dummy embedding. `start_keep_warm` repeats
+    this on a background thread during working hours, so no model is
+    unloaded or cold when a user asks a question.
+    """
+
+    def __init__(self, llm, retriever=None, interval_seconds: int = None, hours: tuple = None):
+        """
+        Initialize the warm-up manager.
+
+        Args:
+            llm: OllamaInterface to preload
+            retriever: Retriever whose embedding model should be warmed (optional)
+            interval_seconds: Seconds between keep-warm runs
+            hours: (start, end) local hours during which models are kept warm
+        """
+        self.llm = llm
+        self.retriever = retriever
+        self.interval_seconds = interval_seconds or config.KEEP_WARM_INTERVAL_SECONDS
+        self.hours = hours or config.KEEP_WARM_HOURS
+
+        self.readiness = {
+            "ready": False,
+            "llm": {"ready": False, "seconds": None},
+            "embeddings": {"ready": retriever is None, "seconds": None},
+            "checked_at": None
+        }
+        self._stop = threading.Event()
+        self._thread = None
+
+    def warm_llm(self) -> Dict[str, Any]:
+        """
+        Load the default LLM, and any models routed to auxiliary tasks, into Ollama's memory.
+
+        Only the default model decides readiness; a routed model that fails
+        to load just sends its tasks to the default model.
+
+        Returns:
+            Readiness entry for the LLM
+        """
+        start = time.perf_counter()
+        default_model, *routed_models = self.llm.router.models()
+        ready = self.llm.preload(model_name=default_model)
+        for model_name in routed_models:
+            self.llm.preload(model_name=model_name)
+        return {"ready": ready, "seconds": time.perf_counter() - start}
+
+    def warm_embeddings(self) -> Dict[str, Any]:
+        """
+        Run one dummy embedding so the first real query does not pay for lazy initialization.
+
+        Returns:
+            Readiness entry for the embedding model
+        """
+        if self.retriever is None:
+            return {"ready": True, "seconds": None}
+
+        start = time.perf_counter()
+        try:
+            self.retriever.generate_embedding("CISSP warm-up query")
+            ready = True
+        except Exception as e:
+            print(f"Error warming up embedding model: {e}")
+            ready = False
+        return {"ready": ready, "seconds": time.perf_counter() - start}
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Warm both models and update the readiness report.
+
+        Returns:
+            Readiness report
+        """
+        llm = self.warm_llm()
+        embeddings = self.warm_embeddings()
+        self.readiness = {
+            "ready": llm["ready"] and embeddings["ready"],
+            "llm": llm,
+            "embeddings": embeddings,
+            "checked_at": datetime.now().isoformat()
+        }
+        return self.readiness
+
+    def in_working_hours(self, now: Optional[datetime] = None) -> bool:
+        """
+        Check whether models should currently be kept warm.
+
+        Args:
+            now: Time to check (defaults to the current local time)
+
+        Returns:
+            True during the configured working hours
+        """
+        start, end = self.hours
+        hour = (now or datetime.now()).hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end  # Window spanning midnight
+
+    def _keep_warm_loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            if self.in_working_hours():
+                self.warm_up()
+
+    def start_keep_warm(self) -> None:
+        """
+        Start re-warming the models in the background on the configured interval.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._keep_warm_loop, name="keep-warm", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background keep-warm thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    @staticmethod
+    def format_report(report: Dict[str, Any]) -> str:
+        """
+        Format a readiness report for display.
+
+        Args:
+            report: Readiness report from warm_up
+
+        Returns:
+            Human-readable summary
+        """
+        lines = []
+        for name, label in (("llm", "LLM"), ("embeddings", "Embedding model")):
+            entry = report[name]
+            status = "ready" if entry["ready"] else "NOT READY"
+            timing = f" ({entry['seconds']:.2f}s)" if entry["seconds"] is not None else ""
+            lines.append(f"{label}: {status}{timing}")
+        return "\n".join(lines)
@@ -0,0 +1,170 @@
+"""
+Semantic answer cache for serving near-duplicate tutor questions.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import config
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of tutor answers keyed by query embedding.
+
+    A new question is served from the cache when its embedding is within the
+    cosine similarity threshold of a cached question, asked against the same
+    index version and search scope. Entries expire after a TTL and the least
+    recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, threshold: float = None, ttl_seconds: int = None, max_entries: int = None):
+        """
+        Initialize the answer cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Lifetime of an entry in seconds
+            max_entries: Maximum number of cached answers
+        """
+        self.threshold = threshold or config.ANSWER_CACHE_THRESHOLD
+        self.ttl_seconds = ttl_seconds or config.ANSWER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or config.ANSWER_CACHE_MAX_ENTRIES
+
+        self._entries = OrderedDict()  # entry_id -> entry, least recently used first
+        self._matrix = None  # Stacked embeddings of the entries, rebuilt lazily
+        self._matrix_ids = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [entry_id for entry_id, entry in self._entries.items()
+                   if now - entry["created_at"] > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._matrix = None
+
+    def lookup(self, query_embedding: List[float], index_version: str,
+               scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically equivalent question.
+
+        Args:
+            query_embedding: Embedding of the new question
+            index_version: Current version of the retrieval index
+            scope: Key identifying the search scope the question was asked in
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        query = self._normalize(query_embedding)
+
+        with self._lock:
+            self._purge_expired(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries)
+                self._matrix = np.vstack([self._entries[i]["embedding"] for i in self._matrix_ids])
+
+            # Score every cached question in one matrix-vector product
+            similarities = self._matrix @ query
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.threshold:
+                    break
+                entry = self._entries[self._matrix_ids[position]]
+                if entry["index_version"] == index_version and entry["scope"] == scope:
+                    self._entries.move_to_end(self._matrix_ids[position])
+                    self.hits += 1
+                    return entry["response"]
+
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding: List[float], chunk_ids: List[str], response: Dict[str, Any],
+              index_version: str, scope: str = "") -> int:
+        """
+        Cache an answer.
+
+        Args:
+            query_embedding: Embedding of the question
+            chunk_ids: IDs of the chunks the answer was generated from
+            response: Tutor response to serve on later hits
+            index_version: Version of the retrieval index the answer was generated against
+            scope: Key identifying the search scope
+
+        Returns:
+            ID of the new entry, for later updates
+        """
+        with self._lock:
+            self._purge_expired(time.time())
+            entry_id = self._next_id
+            self._entries[entry_id] = {
+                "embedding": self._normalize(query_embedding),
+                "chunk_ids": list(chunk_ids),
+                "response": response,
+                "index_version": index_version,
+                "scope": scope,
+                "created_at": time.time()
+            }
+            self._next_id += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            return entry_id
+
+    def update(self, entry_id: int, fields: Dict[str, Any]) -> None:
+        """
+        Add fields to a cached response, e.g. ones generated after the answer.
+
+        The response is replaced rather than modified, so responses already
+        served from the entry are unaffected. Expired or evicted entries are ignored.
+
+        Args:
+            entry_id: ID returned by store
+            fields: Response fields to set
+        """
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is not None:
+                entry["response"] = dict(entry["response"], **fields)
+
+    def clear(self) -> None:
+        """
+        Remove all cached answers.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with entry count, hits, misses and hit rate
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -4,14 +4,26 @@ Tutoring system module for interactive Q&A and adaptive learning.
 import os
 import json
 import time
-from typing import Dict, List, Any, Optional
+import contextvars
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Iterator
 from datetime import datetime
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import config
 from src.retrieval.retriever import Retriever
-from src.retrieval.llm_interface import OllamaInterface, RAGPromptBuilder
+from src.retrieval.llm_interface import OllamaInterface, RAGPromptBuilder, StreamInterruptedError
+from src.retrieval.llm_scheduler import request_scope
+from src.retrieval.context_packer import estimate_tokens
+from src.retrieval.query_classifier import QueryClassifier
+from src.retrieval.structured_output import FollowUpQuestions, ReviewQuestion
+from src.tutoring.answer_cache import SemanticAnswerCache
+
+
+# Appended to a streamed answer that failed part-way through
+INTERRUPTED_NOTICE = "\n\nError: The answer was interrupted. Please ask again."
 
 
 class UserSession:
@@ -30,6 +42,8 @@ class UserSession:
         self.session_id = f"{user_id}_{int(time.time())}"
         self.interaction_history = []
         self.topic_strengths = {}  # Track user's understanding of topics
+        self.answer_cache_opt_out = False  # Always generate fresh answers for this user
+        self.chat_messages = []  # Prior turns (questions without their context), reused as a stable prefix
         self.last_active = datetime.now()
 
     def add_interaction(self, query: str, response: str, metadata: Dict[str, Any] = None) -> None:
@@ -51,6 +65,50 @@ class UserSession:
         self.interaction_history.append(interaction)
         self.last_active = datetime.now()
 
+    def build_chat_messages(self, system_prompt: str, user_message: str) -> List[Dict[str, str]]:
+        """
+        Build the message list for the next chat turn.
+
+        The system prompt and earlier turns come first, so the LLM server can
+        reuse their cached prefill. Only the new turn carries retrieved
+        context; earlier turns keep just the user's question.
+
+        Args:
+            system_prompt: System prompt
+            user_message: Message for the new turn, including its context
+
+        Returns:
+            Chat messages
+        """
+        return ([{"role": "system", "content": system_prompt}] + self.chat_messages +
+                [{"role": "user", "content": user_message}])
+
+    def add_chat_turn(self, user_message: str, answer: str, token_budget: int = None) -> None:
+        """
+        Record a completed chat turn.
+
+        When the history outgrows the token budget, the oldest turns are
+        dropped down to half the budget in one step, so the shared prefix
+        only changes occasionally instead of on every turn.
+
+        Args:
+            user_message: The user's question, without the retrieved context
+            answer: Assistant reply
+            token_budget: Maximum tokens of history to keep
+        """
+        token_budget = token_budget or config.CHAT_HISTORY_TOKEN_BUDGET
+        self.chat_messages.extend([
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": answer}
+        ])
+
+        tokens = sum(estimate_tokens(message["content"]) for message in self.chat_messages)
+        if tokens <= token_budget:
+            return
+        while self.chat_messages and tokens > token_budget // 2:
+            tokens -= sum(estimate_tokens(message["content"]) for message in self.chat_messages[:2])
+            del self.chat_messages[:2]
+
     def get_recent_interactions(self, count: int = None) -> List[Dict[str, Any]]:
         """
         Get recent interactions from the history.
@@ -108,7 +166,8 @@ class UserSession:
                 "session_id": self.session_id,
                 "last_active": self.last_active.isoformat(),
                 "interaction_history": self.interaction_history,
-                "topic_strengths": self.topic_strengths
+                "topic_strengths": self.topic_strengths,
+                "answer_cache_opt_out": self.answer_cache_opt_out
             }, f, indent=2)
 
         return filepath
@@ -131,6 +190,7 @@ class UserSession:
         session.session_id = data["session_id"]
         session.interaction_history = data["interaction_history"]
         session.topic_strengths = data["topic_strengths"]
+        session.answer_cache_opt_out = data.get("answer_cache_opt_out", False)
         session.last_active = datetime.fromisoformat(data["last_active"])
 
         return session
@@ -141,13 +201,15 @@ class AdaptiveLearning:
     Manages adaptive learning features with enhanced AI capabilities.
     """
     
-    def __init__(self):
+    def __init__(self, classifier: Optional[QueryClassifier] = None):
         self.learning_history = {}
         self.topic_strengths = defaultdict(float)
         self.learning_patterns = defaultdict(list)
+        self.classifier = classifier
         
-    def analyze_query(self, query: str, user_id: str) -> Dict[str, Any]:
-        """Enhanced query analysis with user context"""
+    def analyze_query(self, query: str, user_id: str,
+                      query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Enhanced query analysis with user context; pass the query embedding when it is already computed"""
         # Track user's learning patterns
         self.learning_patterns[user_id].append({
             'query': query,
@@ -156,7 +218,8 @@ class AdaptiveLearning:
         
         # Analyze complexity and topics
         analysis = self._analyze_complexity(query)
-        topics = self._identify_topics(query)
+        classification = self._classify(query, query_embedding)
+        topics = classification["topics"]
         
         # Consider user's history
         if user_id in self.learning_history:
@@ -165,6 +228,7 @@ class AdaptiveLearning:
             
         return {
             'topics': topics,
+            'intent': classification['intent'],
             'complexity': analysis['complexity'],
             'recommended_depth': analysis.get('recommended_depth', 0.5),
             'weak_areas': analysis.get('weak_areas', []),
@@ -180,25 +244,17 @@ class AdaptiveLearning:
             'complexity': min(1.0, (len(query.split()) + term_count * 2) / 30)
         }
         
-    def _identify_topics(self, query: str) -> List[str]:
-        """Identify CISSP domains and subtopics"""
-        domains = [
-            "Security and Risk Management",
-            "Asset Security", 
-            "Security Architecture and Engineering",
-            "Communication and Network Security",
-            "Identity and Access Management",
-            "Security Assessment and Testing",
-            "Security Operations",
-            "Software Development Security"
-        ]
+    def _classify(self, query: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Classify intent and CISSP domains against the precomputed centroids"""
+        if self.classifier is None:
+            self.classifier = QueryClassifier()
+        if query_embedding is None:
+            query_embedding = self.classifier.encode(query)
+        return self.classifier.classify(query_embedding)
         
-        identified = []
-        for domain in domains:
-            if any(keyword.lower() in query.lower() for keyword in domain.split()):
-                identified.append(domain)
-                
-        return identified or ["General Security Concepts"]
+    def _identify_topics(self, query: str, query_embedding: Optional[List[float]] = None) -> List[str]:
+        """Identify CISSP domains"""
+        return self._classify(query, query_embedding)["topics"]
         
     def _calculate_depth(self, user_id: str, topics: List[str]) -> float:
         """Calculate appropriate depth based on user history"""
@@ -225,44 +281,6 @@ class AdaptiveLearning:
             "vulnerability", "threat", "exploit", "mitigation",
             "cryptography", "network security", "security controls"
         }
-        """
-        Analyze a query to identify topics and complexity.
-
-        Args:
-            query: User query
-
-        Returns:
-            Dictionary with analysis results
-        """
-        # This is a placeholder for more sophisticated analysis
-        # In a real implementation, this would use NLP to identify topics
-
-        # CISSP domains
-        domains = [
-            "Security and Risk Management",
-            "Asset Security",
-            "Security Architecture and Engineering",
-            "Communication and Network Security",
-            "Identity and Access Management",
-            "Security Assessment and Testing",
-            "Security Operations",
-            "Software Development Security"
-        ]
-
-        # Simple keyword matching for domains
-        identified_domains = []
-        for domain in domains:
-            if any(keyword.lower() in query.lower() for keyword in domain.split()):
-                identified_domains.append(domain)
-
-        # Estimate complexity based on query length and structure
-        complexity = min(1.0, len(query.split()) / 20)  # Simple heuristic
-
-        return {
-            "topics": identified_domains,
-            "complexity": complexity,
-            "timestamp": datetime.now().isoformat()
-        }
 
     @staticmethod
     def generate_follow_up_questions(query: str, response: str, llm: OllamaInterface) -> List[str]:
@@ -286,34 +304,14 @@ Answer: {response}
 
 Generate 3 follow-up questions that would help deepen understanding of this topic. 
 The questions should be progressively more advanced and help explore related concepts.
-Format your response as a JSON array of strings, each containing one question.
+Respond with a JSON object whose "questions" field is an array of the question strings.
 """
 
         system_prompt = "You are a CISSP tutor generating follow-up questions to deepen understanding."
 
-        try:
-            result = llm.generate(prompt, system_prompt, temperature=0.7)
-
-            # Try to parse as JSON
-            try:
-                questions = json.loads(result)
-                if isinstance(questions, list):
-                    return questions[:3]  # Limit to 3 questions
-            except json.JSONDecodeError:
-                # Fallback: extract questions using simple parsing
-                questions = []
-                for line in result.split('\n'):
-                    line = line.strip()
-                    if line and ('?' in line) and (line[0].isdigit() or line[0] == '-'):
-                        # Remove leading numbers or bullets
-                        question = line.split('?')[0] + '?'
-                        question = question.lstrip('0123456789.- ')
-                        questions.append(question)
-
-                return questions[:3]  # Limit to 3 questions
-
-        except Exception as e:
-            print(f"Error generating follow-up questions: {e}")
+        result = llm.generate_structured(prompt, FollowUpQuestions, system_prompt, profile="follow_ups")
+        if result is not None:
+            return result.questions
 
         # Fallback questions if generation fails
         return [
@@ -363,156 +361,22 @@ Explain why the correct answer is right and why the others are wrong.
 
 Also include 1-3 specific references that support the correct answer. These should be actual CISSP study materials, books, or official guides with specific page numbers or sections when possible.
 
-The response should be in this format (without showing the JSON structure to the user):
-1. A clear question about {topic}
-2. Four options labeled A through D
-3. The correct answer letter
-4. A detailed explanation of why the correct answer is right and why the others are wrong
-5. References that support the correct answer (1-3 specific sources)
+Respond with a JSON object with these fields:
+- question_text: the question
+- options: array of the 4 option texts, in order A to D
+- correct_answer: the letter of the correct option (A, B, C, or D)
+- explanation: why the correct answer is right and why the others are wrong
+- references: array of 1-3 references that support the correct answer
 """
 
         system_prompt = "You are a CISSP exam question generator creating challenging review questions."
 
-        try:
-            result = llm.generate(prompt, system_prompt, temperature=0.7)
-
-            # Try to extract the question data using a more robust approach
-            # First, clean up any JSON or markdown formatting
-            cleaned_result = result.replace('```json', '').replace('```', '').strip()
-
-            # Try to parse as JSON if the response appears to be in JSON format
-            if cleaned_result.startswith('{') and cleaned_result.endswith('}'): 
-                try:
-                    question_data = json.loads(cleaned_result)
-                    # Ensure the question doesn't contain JSON formatting
-                    if isinstance(question_data.get('question'), str):
-                        question_data['question'] = question_data['question'].replace('```json', '').replace('```', '')
-                    if isinstance(question_data.get('explanation'), str):
-                        question_data['explanation'] = question_data['explanation'].replace('```json', '').replace('```', '')
-                    return question_data
-                except json.JSONDecodeError:
-                    pass  # Fall through to the parsing approach
-
-            # Fallback: extract question data using structured parsing
-            lines = result.split('\n')
-            question = ""
-            options = []
-            correct_answer = ""
-            explanation = ""
-
-            # Simple state machine for parsing
-            state = "question"
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-
-                # Check for option markers to transition to options state
-                if state == "question" and (line.startswith(("A)", "A.", "A:")) or 
-                                          line.startswith(("Option A", "A -", "(A)"))): 
-                    state = "options"
-
-                if state == "question":
-                    # Skip lines that look like JSON formatting or markdown
-                    if not (line.startswith('{') or line.startswith('"') or line.startswith('```')):
-                        question += line + " "
-
-                elif state == "options":
-                    # Capture options with various formats (A., A:, A), etc.)
-                    option_match = False
-                    for prefix in [("A", "a"), ("B", "b"), ("C", "c"), ("D", "d")]:
-                        if any(line.startswith(f"{p}{s}") for p in prefix for s in [")", ".", ":", " -", ". "]):
-                            options.append(line)
-                            option_match = True
-                            break
-
-                    # If we've collected all options, move to answer state
-                    if len(options) == 4:
-                        state = "answer"
-
-                    # Check for correct answer indicator
-                    if not option_match and ("correct answer" in line.lower() or 
-                                           "answer:" in line.lower() or 
-                                           "correct:" in line.lower()):
-                        state = "answer"
-                        # Try to extract the answer letter
-                        for letter in ["A", "B", "C", "D"]:
-                            if letter in line:
-                                correct_answer = letter
-                                break
-
-                elif state == "answer" and not correct_answer:
-                    # Try to find the correct answer letter
-                    if any(marker in line.lower() for marker in ["correct", "answer"]):
-                        for letter in ["A", "B", "C", "D"]:
-                            if letter in line:
-                                correct_answer = letter
-                                state = "explanation"
-                                break
-
-                elif state == "explanation" or (state == "answer" and correct_answer):
-                    # Skip lines that look like JSON formatting
-                    if not (line.startswith('}') or line.startswith('"')):
-                        explanation += line + " "
-
-            # Clean up the explanation to remove any JSON artifacts
-            explanation = explanation.replace('"explanation":', '').replace('"', '').strip()
-
-            # Ensure we have valid options
-            if len(options) < 4:
-                # Create default options if we couldn't parse them
-                options = [
-                    "A) Option A",
-                    "B) Option B",
-                    "C) Option C",
-                    "D) Option D"
-                ]
+        result = llm.generate_structured(prompt, ReviewQuestion, system_prompt, profile="review_question")
+        if result is not None:
+            references_list = [{"id": i + 1, "text": ref.strip()}
+                               for i, ref in enumerate(result.references) if ref.strip()]
 
-            # Extract references if present
-            references_list = []
-            if "references:" in result.lower() or "reference:" in result.lower() or "sources:" in result.lower() or "source:" in result.lower():
-                ref_section = False
-                ref_text = ""
-
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Check for reference section markers
-                    if not ref_section and any(marker in line.lower() for marker in ["references:", "reference:", "sources:", "source:"]):
-                        ref_section = True
-                        continue
-
-                    if ref_section:
-                        ref_text += line + "\n"
-
-                # Process reference text into individual references
-                if ref_text:
-                    # Split by common reference separators
-                    ref_items = []
-                    if "\n" in ref_text:
-                        # Split by newlines if they appear to be separate references
-                        potential_refs = ref_text.split("\n")
-                        for ref in potential_refs:
-                            if ref and len(ref.strip()) > 10:  # Minimum length to be a reference
-                                ref_items.append(ref.strip())
-                    else:
-                        # Single reference or comma-separated list
-                        ref_items = [ref.strip() for ref in ref_text.split(",") if ref.strip()]                
-
-                    # Clean up references and add to list
-                    for i, ref in enumerate(ref_items):
-                        # Remove numbering if present
-                        if ref and len(ref) > 3 and ref[0].isdigit() and ref[1:3] in [". ", ") ", ": "]:
-                            ref = ref[3:]
-                        if ref and len(ref.strip()) > 5:  # Ensure it's not empty after cleaning
-                            references_list.append({
-                                "id": i+1,
-                                "text": ref.strip()
-                            })
-
-            # If no references were found in the LLM output, use the retrieved documents
+            # If the LLM gave no references, use the retrieved documents
             if not references_list and retrieved_docs:
                 for i, doc in enumerate(retrieved_docs[:3]):  # Use up to 3 references
                     if doc["metadata"] and "source" in doc["metadata"]:
@@ -527,16 +391,13 @@ The response should be in this format (without showing the JSON structure to the
                         })
 
             return {
-                "question": question.strip(),
-                "options": options,
-                "correct_answer": correct_answer or "A",  # Default if parsing fails
-                "explanation": explanation.strip(),
+                "question": result.question_text,
+                "options": result.options,
+                "correct_answer": result.correct_answer,
+                "explanation": result.explanation,
                 "references": references_list
             }
 
-        except Exception as e:
-            print(f"Error generating review question: {e}")
-
         # Fallback question if generation fails
         return {
             "question": f"Which of the following best describes a key concept in {topic}?",
@@ -589,6 +450,10 @@ class CISSPTutor:
         self.llm = OllamaInterface()
         self.prompt_builder = RAGPromptBuilder()
         self.sessions = {}  # user_id -> UserSession
+        self.answer_cache = SemanticAnswerCache() if config.ANSWER_CACHE_ENABLED else None
+        self.adaptive = AdaptiveLearning(QueryClassifier(self.retriever.model))
+        self.follow_up_executor = ThreadPoolExecutor(max_workers=config.FOLLOW_UP_WORKERS,
+                                                     thread_name_prefix="follow-ups")
 
         # Check if LLM is available
         if not self.llm.is_available():
@@ -609,64 +474,161 @@ class CISSPTutor:
 
         return self.sessions[user_id]
 
-    def answer_question(self, user_id: str, query: str) -> Dict[str, Any]:
+    def set_answer_cache_opt_out(self, user_id: str, opt_out: bool) -> None:
         """
-        Answer a user's question using RAG with enhanced reasoning and multi-step analysis.
+        Opt a user in to or out of receiving cached answers.
+
+        Args:
+            user_id: User ID
+            opt_out: True to always generate fresh answers for this user
         """
-        session = self.get_or_create_session(user_id)
+        self.get_or_create_session(user_id).answer_cache_opt_out = opt_out
 
-        # Multi-step query analysis
-        analysis = AdaptiveLearning.analyze_query(query)
-        query_intent = self.llm.classify_intent(query)
-        knowledge_gaps = session.identify_knowledge_gaps(analysis["topics"])
-
-        # Enhanced retrieval with context awareness
-        results = self.retriever.retrieve(
-            query,
-            additional_context={
-                "intent": query_intent,
-                "gaps": knowledge_gaps,
-                "session_history": session.get_recent_interactions(5)
-            }
-        )
+    def reset_chat(self, user_id: str) -> None:
+        """
+        Start a new conversation for a user, discarding prior chat turns.
+
+        Args:
+            user_id: User ID
+        """
+        self.get_or_create_session(user_id).chat_messages = []
+
+    @staticmethod
+    def _cache_scope(filters: Optional[Dict[str, Any]]) -> str:
+        """
+        Build a stable key for a search scope so answers are only shared within the same scope.
+        """
+        if not filters:
+            return ""
+        return json.dumps({key: value for key, value in filters.items() if value}, sort_keys=True, default=str)
+
+    def _uses_answer_cache(self, session: UserSession) -> bool:
+        """
+        Check whether a session's next answer may be served from or stored in the shared answer cache.
+
+        In chat mode an answer depends on the conversation so far, so only
+        the first question of a conversation is shared between users.
+        """
+        if self.answer_cache is None or session.answer_cache_opt_out:
+            return False
+        return not (config.TUTOR_CHAT_MODE and session.chat_messages)
+
+    def _lookup_cached_answer(self, session: UserSession, query: str, query_embedding: List[float],
+                              filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Serve a near-duplicate question from the semantic cache, recording the interaction on a hit.
+        """
+        if not self._uses_answer_cache(session):
+            return None
+
+        cached = self.answer_cache.lookup(query_embedding, self.retriever.index_version(),
+                                          self._cache_scope(filters))
+        if cached is None:
+            return None
+
+        response = dict(cached, cached=True)
+        response["follow_ups"] = Future()
+        response["follow_ups"].set_result(response.get("follow_up_questions", []))
+        if config.TUTOR_CHAT_MODE:
+            session.add_chat_turn(query, response["answer"])
+        session.add_interaction(query, response["answer"], {
+            "sources": response["sources"],
+            "cached": True
+        })
+        return response
+
+    def _prepare_answer(self, session: UserSession, query: str, query_embedding: List[float],
+                        filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Analyze the query, retrieve and pack context, and build the prompts for generation.
+        """
+        # Classify intent and topics from the query embedding, and flag topics the user is weak in
+        analysis = self.adaptive.analyze_query(query, session.user_id, query_embedding)
+        weak_topics = set(session.get_weak_topics())
+        analysis["knowledge_gaps"] = [topic for topic in analysis["topics"] if topic in weak_topics]
+
+        # Retrieval scoped to the requested subset of the corpus
+        results = self.retriever.retrieve(query, filters=filters, query_embedding=query_embedding)
 
         # Apply reasoning
         reasoning = ReasoningEngine.chain_of_thought(query, results)
         contradictions = ReasoningEngine.detect_contradictions(results)
 
-        # Format context for the LLM
-        context = self.retriever.format_context(results)
+        # Pack deduplicated context within the token budget (optionally compressed to the
+        # sentences most relevant to the query); citation numbers follow `sources`
+        context, sources = self.retriever.pack_context(results, query_embedding=query_embedding)
 
-        # Build the prompt
-        system_prompt = self.prompt_builder.build_system_prompt()
-        qa_prompt = self.prompt_builder.build_qa_prompt(query, context)
+        return {
+            "analysis": analysis,
+            "results": results,
+            "reasoning": reasoning,
+            "contradictions": contradictions,
+            "sources": sources,
+            "system_prompt": self.prompt_builder.build_system_prompt(),
+            "qa_prompt": self.prompt_builder.build_qa_prompt(query, context)
+        }
+
+    def _complete_answer(self, session: UserSession, query: str, query_embedding: List[float],
+                         filters: Optional[Dict[str, Any]], prepared: Dict[str, Any],
+                         answer: str, response: Dict[str, Any], interrupted: bool = False) -> Dict[str, Any]:
+        """
+        Fill in the response for a generated answer, cache it, update the session and start the follow-ups.
 
-        # Generate the answer
-        answer = self.llm.generate(qa_prompt, system_prompt)
+        An interrupted (partial) answer is returned as is, without follow-ups,
+        and is neither cached nor recorded in the session.
 
+        Follow-up questions are generated in the background so the answer is
+        returned after a single generation. They are delivered only through
+        `response["follow_ups"]`, a Future resolving to the questions, and
+        added to the cached response once generated.
+        """
+        analysis = prepared["analysis"]
+        contradictions = prepared["contradictions"]
 
-        # Prepare the response
-        response = {
+        response.update({
             "answer": answer,
-            "reasoning": reasoning,
-            "sources": [result["metadata"] for result in results],
+            "reasoning": prepared["reasoning"],
+            "sources": prepared["sources"],
             "has_contradictions": contradictions["has_contradictions"],
             "contradiction_explanation": contradictions["explanation"],
-            "follow_up_questions": [], # Placeholder -  Follow-up questions generation moved below
-            "topics": analysis["topics"]
-        }
+            "topics": analysis["topics"],
+            "intent": analysis["intent"],
+            "interrupted": interrupted
+        })
 
-        # Generate follow-up questions
-        response["follow_up_questions"] = AdaptiveLearning.generate_follow_up_questions(
-            query, answer, self.llm
-        )
+        failed = interrupted or answer.startswith("Error:")
+        if failed:
+            response["follow_ups"] = Future()
+            response["follow_ups"].set_result([])
+            if interrupted:
+                return response
+
+        # Cache the answer now; its follow-up questions are added once generated
+        entry_id = None
+        if self._uses_answer_cache(session) and not failed:
+            entry_id = self.answer_cache.store(
+                query_embedding,
+                [result["id"] for result in prepared["results"]],
+                {key: value for key, value in response.items() if key != "answer_stream"},
+                self.retriever.index_version(),
+                self._cache_scope(filters)
+            )
+
+        # Generate follow-up questions in the background, keeping the caller's request scope
+        if not failed:
+            context = contextvars.copy_context()
+            response["follow_ups"] = self.follow_up_executor.submit(
+                context.run, self._generate_follow_ups, query, answer, entry_id
+            )
 
         # Update the session
+        if config.TUTOR_CHAT_MODE and not failed:
+            session.add_chat_turn(query, answer)
         session.add_interaction(query, answer, {
             "analysis": analysis,
-            "sources": [result["metadata"] for result in results],
+            "sources": prepared["sources"],
             "has_contradictions": contradictions["has_contradictions"],
-            "reasoning": reasoning
+            "reasoning": prepared["reasoning"]
         })
 
         # Update topic strengths based on the query
@@ -680,6 +642,105 @@ class CISSPTutor:
 
         return response
 
+    def _generate_follow_ups(self, query: str, answer: str, entry_id: Optional[int]) -> List[str]:
+        """
+        Generate follow-up questions for an answer and add them to its cache entry.
+        """
+        questions = AdaptiveLearning.generate_follow_up_questions(query, answer, self.llm)
+        if entry_id is not None:
+            self.answer_cache.update(entry_id, {"follow_up_questions": questions})
+        return questions
+
+    def answer_question(self, user_id: str, query: str,
+                        filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Answer a user's question using RAG with enhanced reasoning and multi-step analysis.
+
+        Args:
+            user_id: User ID
+            query: User query
+            filters: Optional search scope (book title, page range, source type
+                or CISSP domain; see Retriever.build_where)
+
+        Returns:
+            Dictionary with the answer and sources, and a `follow_ups` Future
+            resolving to the follow-up questions
+        """
+        session = self.get_or_create_session(user_id)
+        query_embedding = self.retriever.generate_embedding(query)
+
+        cached = self._lookup_cached_answer(session, query, query_embedding, filters)
+        if cached is not None:
+            return cached
+
+        prepared = self._prepare_answer(session, query, query_embedding, filters)
+
+        # Generate the answer; LLM calls are queued fairly per user
+        with request_scope(user_id=user_id):
+            if config.TUTOR_CHAT_MODE:
+                messages = session.build_chat_messages(prepared["system_prompt"], prepared["qa_prompt"])
+                answer = self.llm.chat(messages, profile="answer")
+            else:
+                answer = self.llm.generate(prepared["qa_prompt"], prepared["system_prompt"], profile="answer")
+
+            return self._complete_answer(session, query, query_embedding, filters, prepared, answer, {})
+
+    def answer_question_stream(self, user_id: str, query: str,
+                               filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Answer a user's question, streaming the answer as the LLM generates it.
+
+        Retrieval runs before this returns, so the sources are available up
+        front. The answer is read from `response["answer_stream"]`; once the
+        stream is exhausted, the remaining fields ("answer", contradictions
+        and the `follow_ups` Future) are filled in on the same dictionary.
+        If generation fails part-way, the stream ends with INTERRUPTED_NOTICE
+        and `response["interrupted"]` is True.
+
+        Args:
+            user_id: User ID
+            query: User query
+            filters: Optional search scope (see answer_question)
+
+        Returns:
+            Dictionary with the sources and an `answer_stream` iterator of text fragments
+        """
+        session = self.get_or_create_session(user_id)
+        query_embedding = self.retriever.generate_embedding(query)
+
+        cached = self._lookup_cached_answer(session, query, query_embedding, filters)
+        if cached is not None:
+            cached["answer_stream"] = iter([cached["answer"]])
+            return cached
+
+        prepared = self._prepare_answer(session, query, query_embedding, filters)
+        response = {"sources": prepared["sources"]}
+
+        def stream() -> Iterator[str]:
+            parts = []
+            interrupted = False
+            # Scopes are kept off the yields, so they never leak into the consumer's context
+            with request_scope(user_id=user_id):
+                if config.TUTOR_CHAT_MODE:
+                    messages = session.build_chat_messages(prepared["system_prompt"], prepared["qa_prompt"])
+                    tokens = self.llm.chat_stream(messages, profile="answer")
+                else:
+                    tokens = self.llm.generate_stream(prepared["qa_prompt"], prepared["system_prompt"],
+                                                      profile="answer")
+            try:
+                for token in tokens:
+                    parts.append(token)
+                    yield token
+            except StreamInterruptedError:
+                interrupted = True
+                yield INTERRUPTED_NOTICE
+            with request_scope(user_id=user_id):
+                self._complete_answer(session, query, query_embedding, filters, prepared,
+                                      "".join(parts), response, interrupted)
+
+        response["answer_stream"] = stream()
+        return response
+
     def generate_review_question(self, user_id: str, topic: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate a review question for a user.
@@ -714,7 +775,8 @@ class CISSPTutor:
                 topic = random.choice(domains)
 
         # Generate the question
-        question_data = AdaptiveLearning.generate_review_question(topic, self.llm)
+        with request_scope(user_id=user_id):
+            question_data = AdaptiveLearning.generate_review_question(topic, self.llm)
 
         # Add metadata
         question_data["topic"] = topic
@@ -797,7 +859,7 @@ if __name__ == "__main__":
     print(response["reasoning"])
 
     print("\nFollow-up Questions:")
-    for i, question in enumerate(response["follow_up_questions"]):
+    for i, question in enumerate(response["follow_ups"].result()):
         print(f"{i+1}. {question}")
 
     # Test generating a review question